@@ -0,0 +1,62 @@
+"""
+Memory per rock and draw time of the array-backed Rock geometry,
+compared with the previous lists of Vector2 points plus a kept Delaunay object
+
+usage: python -m benchmarks.bench_geometry
+"""
+
+import os
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from scipy.spatial import ConvexHull, Delaunay
+
+from benchmarks.bench_lighting import legacy_draw, timeit
+from src.globals import Globals
+from src.rock import Point, Rock, rotate_points
+
+POINT_COUNTS = [10_000, 50_000, 100_000]
+
+
+class LegacyRock:
+    def __init__(self, points):
+        self.points = [Point(*i) for i in points.tolist()]
+        self.tri = Delaunay(self.points)
+        self.outer_points = [self.points[i] for i in ConvexHull(self.points).vertices]
+        self.angle = 30
+        self.pos = Point(600, 400)
+
+
+def traced(f):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = f()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, size
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode([1200, 800])
+    Globals.LIGHT_COORD = [100, 100]
+    print(f'{"points":>8} {"legacy KB":>10} {"arrays KB":>10} {"legacy transform ms":>20} {"array transform ms":>19} '
+          f'{"legacy draw ms":>15} {"draw ms":>8}')
+    for n in POINT_COUNTS:
+        rock = Rock(700, 500, n, Point(600, 400), seed=n)
+        rock.angle = 30
+        legacy, legacy_size = traced(lambda: LegacyRock(rock.points))
+        _, array_size = traced(lambda: (rock.points.copy(), rock.simplices.copy(), rock.hull.copy()))
+        repeat = 1 if n >= 50_000 else 3
+        legacy_transform = timeit(lambda: [i.rotate(legacy.angle) + legacy.pos for i in legacy.points], repeat)
+        array_transform = timeit(lambda: rotate_points(rock.points, rock.angle) + rock.pos, repeat)
+        legacy_time = timeit(lambda: legacy_draw(legacy.points, legacy.tri.simplices, legacy.angle, legacy.pos, screen), repeat)
+        draw_time = timeit(lambda: [rock.invalidate(), rock.draw(screen)], repeat)
+        print(f'{n:>8} {legacy_size / 1024:>10,.0f} {array_size / 1024:>10,.0f} {legacy_transform:>20.2f} '
+              f'{array_transform:>19.2f} {legacy_time:>15.2f} {draw_time:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
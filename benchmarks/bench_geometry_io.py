@@ -0,0 +1,72 @@
+"""
+File size and load time of the exported geometry: JSON vs .npz vs one memory-mapped batch file
+
+usage: python -m benchmarks.bench_geometry_io
+"""
+
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+
+from src.app import RockApp
+from src.globals import Globals
+from src.rock_io import BatchReader, BatchWriter, load_npz
+
+ROCKS = 200
+POINT_COUNTS = [25, 1_000, 10_000]
+
+
+def load_json(filename):
+    with open(filename) as f:
+        data = json.load(f)
+    return np.array(data['points'], dtype=np.float32), np.array(data['simplices'], dtype=np.int32)
+
+
+def timed(f):
+    t = time.perf_counter()
+    f()
+    return (time.perf_counter() - t) * 1000
+
+
+def main():
+    app = RockApp()
+    print(f'{"points":>8} {"format":>6} {"total KB":>10} {"load all ms":>12} {"load one ms":>12}')
+    for n in POINT_COUNTS:
+        Globals.ROCK_POINTS = n
+        with tempfile.TemporaryDirectory() as directory:
+            names = [os.path.join(directory, f'rock_{i:05d}') for i in range(ROCKS)]
+            batch_name = os.path.join(directory, 'rocks.rocks')
+            with BatchWriter(batch_name) as batch:
+                for i, name in enumerate(names):
+                    app.generate_rock(seed=i)
+                    app.rock.angle = 30
+                    app.export_json(name + '.json')
+                    app.export_npz(name + '.npz')
+                    batch.add(app.rock)
+
+            def load_batch(indices):
+                with BatchReader(batch_name) as reader:
+                    for i in indices:
+                        rock = reader[i]
+                        rock['points'].sum(), rock['simplices'].sum()
+
+            last = ROCKS - 1
+            results = [
+                ('json', [i + '.json' for i in names], lambda: [load_json(i + '.json') for i in names],
+                 lambda: load_json(names[last] + '.json')),
+                ('npz', [i + '.npz' for i in names], lambda: [load_npz(i + '.npz') for i in names],
+                 lambda: load_npz(names[last] + '.npz')),
+                ('batch', [batch_name], lambda: load_batch(range(ROCKS)), lambda: load_batch([last])),
+            ]
+            for name, files, load_all, load_one in results:
+                size = sum(os.path.getsize(i) for i in files)
+                print(f'{n:>8} {name:>6} {size / 1024:>10,.0f} {timed(load_all):>12.2f} {timed(load_one):>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+ColorPicker.render_gradient, legacy per-pixel set_at loop vs the vectorized shader
+
+usage: python -m benchmarks.bench_gradient
+"""
+
+import math
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from benchmarks.bench_lighting import timeit
+from src.ui import ColorPicker
+
+SIZES = [(200, 130), (400, 260), (800, 520)]
+
+
+def legacy_gradient(width, height, base_color):
+    # the original shader, kept here as the baseline
+    r1, g1, b1, a1 = base_color
+    surf = pygame.Surface([width, height])
+    surf.lock()
+    for x in range(width):
+        for y in range(height):
+            u, v = x / width, y / height
+            r = g = b = 255 * (1 - math.sqrt(v))
+            a = u * (1 - v)
+            surf.set_at([x, y], [r * (1 - a) + r1 * a, g * (1 - a) + g1 * a, b * (1 - a) + b1 * a, 255])
+    surf.unlock()
+    return surf
+
+
+def main():
+    pygame.init()
+    color = [*pygame.Color('orange')]
+    gradient = ColorPicker.render_gradient
+    print(f'{"size":>10} {"legacy ms":>10} {"vectorized ms":>14} {"speedup":>8}')
+    for w, h in SIZES:
+        legacy = timeit(lambda: legacy_gradient(w, h, color), 3)
+        vectorized = timeit(lambda: gradient(w, h, hex(pygame.Color(color))), 10)
+        print(f'{f"{w}x{h}":>10} {legacy:>10.2f} {vectorized:>14.2f} {legacy / vectorized:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
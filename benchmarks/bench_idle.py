@@ -0,0 +1,52 @@
+"""
+CPU time used by an idle editor, redrawing every frame vs only when something changed
+
+The baseline redraws the whole window every frame, as the editor did before idle frames were
+skipped and dirty rects were added (Config.IDLE_REDRAW and Config.DIRTY_RECTS off).
+
+usage: python -m benchmarks.bench_idle [seconds]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from src.editor import Editor
+from src.globals import Config
+
+# name, Config.IDLE_REDRAW, Config.DIRTY_RECTS
+MODES = [
+    ('full redraw', False, False),
+    ('dirty rects', False, True),
+    ('event driven', True, True),
+]
+
+
+def run(editor, seconds):
+    # let the rock settle in the center before measuring
+    pygame.time.set_timer(pygame.QUIT, 2000, 1)
+    asyncio.run(editor.run())
+    pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+    wall, cpu = time.perf_counter(), time.process_time()
+    asyncio.run(editor.run())
+    return (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    editor = Editor()
+    print(f'{"mode":>14} {"CPU % of one core":>18}')
+    for mode, idle_redraw, dirty_rects in MODES:
+        Config.IDLE_REDRAW = idle_redraw
+        Config.DIRTY_RECTS = dirty_rects
+        usage = run(editor, seconds)
+        print(f'{mode:>14} {usage:>18.1f}')
+
+
+if __name__ == '__main__':
+    main()
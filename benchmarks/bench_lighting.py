@@ -0,0 +1,68 @@
+"""
+Per-frame cost of the lit Rock.draw path, legacy per-triangle loop vs the vectorized shading
+
+usage: python -m benchmarks.bench_lighting
+"""
+
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from src.globals import Globals
+from src.rock import Point, Rock, get_shades, rotate_points
+
+POINT_COUNTS = [25, 1_000, 10_000, 100_000]
+
+
+def legacy_draw(points, simplices, angle, pos, screen):
+    # the original Python loop, kept here as the baseline
+    points = [Point(i).rotate(angle) + pos for i in points]
+    mouse_pos = Point(*Globals.LIGHT_COORD)
+    for simplex in simplices:
+        d = [points[i].distance_to(mouse_pos) for i in simplex]
+        k = 255 - min(d) / 4
+        k = pygame.math.clamp(k, 0, 255)
+        k = k / 255
+        color = pygame.Color(Globals.ROCK_COLOR)
+        r = int(color.r * k)
+        g = int(color.g * k)
+        b = int(color.b * k)
+        color.update(r, g, b)
+        pygame.draw.polygon(screen, color, [points[i] for i in simplex])
+
+
+def timeit(f, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode([1200, 800])
+    Globals.LIGHT_COORD = [100, 100]
+    print(f'{"points":>8} {"triangles":>10} {"legacy ms":>10} {"shading ms":>11} {"draw ms":>9} {"cached ms":>10}')
+    for n in POINT_COUNTS:
+        rock = Rock(700, 500, n, Point(600, 400))
+        rock.angle = 30
+        repeat = 1 if n >= 100_000 else 5
+
+        def shading():
+            points = rotate_points(rock.points, rock.angle) + rock.pos
+            get_shades(points, rock.simplices, Globals.LIGHT_COORD, Globals.ROCK_COLOR)
+
+        legacy = timeit(lambda: legacy_draw(rock.points, rock.simplices, rock.angle, rock.pos, screen), repeat)
+        shade = timeit(shading, repeat)
+        draw = timeit(lambda: [rock.invalidate(), rock.draw(screen)], repeat)
+        cached = timeit(lambda: rock.draw(screen), repeat)
+        print(f'{n:>8} {len(rock.simplices):>10} {legacy:>10.2f} {shade:>11.2f} {draw:>9.2f} {cached:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
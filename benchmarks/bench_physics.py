@@ -0,0 +1,46 @@
+"""
+Time to compute area, centroid, inertia and the collision hull of large meshes,
+a per-triangle Python loop (what loaders used to do) vs the vectorized export
+
+usage: python -m benchmarks.bench_physics
+"""
+
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from benchmarks.bench_lighting import timeit
+from src.physics import get_physics_properties
+from src.rock import Rock, rotate_points
+
+POINT_COUNTS = [1_000, 10_000, 100_000, 500_000]
+
+
+def legacy_physics(points, simplices):
+    area = cx = cy = xx = yy = xy = 0
+    for a, b, c in simplices:
+        (x1, y1), (x2, y2), (x3, y3) = points[a], points[b], points[c]
+        t = abs((x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1)) / 2
+        area += t
+        cx += t * (x1 + x2 + x3) / 3
+        cy += t * (y1 + y2 + y3) / 3
+        xx += t / 6 * (x1 * x1 + x2 * x2 + x3 * x3 + x1 * x2 + x2 * x3 + x1 * x3)
+        yy += t / 6 * (y1 * y1 + y2 * y2 + y3 * y3 + y1 * y2 + y2 * y3 + y1 * y3)
+        xy += t / 12 * (2 * (x1 * y1 + x2 * y2 + x3 * y3) + x1 * y2 + x2 * y1 + x1 * y3 + x3 * y1 + x2 * y3 + x3 * y2)
+    cx, cy = cx / area, cy / area
+    return area, (cx, cy), yy - area * cy ** 2, xx - area * cx ** 2, -(xy - area * cx * cy)
+
+
+def main():
+    print(f'{"points":>8} {"triangles":>10} {"python loop ms":>15} {"vectorized ms":>14}')
+    for n in POINT_COUNTS:
+        rock = Rock(1000, 800, n, seed=n)
+        points = rotate_points(rock.points, 30)
+        repeat = 1 if n >= 100_000 else 3
+        legacy = timeit(lambda: legacy_physics(points.tolist(), rock.simplices.tolist()), repeat)
+        vectorized = timeit(lambda: get_physics_properties(points, rock.simplices, rock.hull), repeat)
+        print(f'{n:>8} {len(rock.simplices):>10} {legacy:>15.2f} {vectorized:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
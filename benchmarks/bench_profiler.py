@@ -0,0 +1,65 @@
+"""
+Cost of the profiler: a section while disabled and enabled, and editor frame times with it off and on
+
+Every frame is drawn (no idle waiting, no frame cap) while the light is dragged, so the rock is relit
+every frame.
+
+usage: python -m benchmarks.bench_profiler [seconds per run]
+"""
+
+import asyncio
+import os
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from src.editor import Editor
+from src.globals import Config, Globals
+from src.profiler import Profiler, profiler
+
+
+class ScriptedEditor(Editor):
+    frame = 0
+
+    def handle_lighting_pos(self):
+        self.frame += 1
+        self.light_edited_once = True
+        Globals.LIGHT_COORD = [300 + self.frame % 400, 200 + self.frame % 100]
+        super().handle_lighting_pos()
+
+
+def bench_section(enabled, number=200_000):
+    p = Profiler()
+    p.enabled = enabled
+
+    def section():
+        with p.section('section'):
+            pass
+
+    return timeit.timeit(section, number=number) / number * 1e9
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f'section disabled {bench_section(False):8.0f} ns')
+    print(f'section enabled  {bench_section(True):8.0f} ns')
+
+    Config.FPS = 0
+    Config.IDLE_REDRAW = False
+    editor = ScriptedEditor()
+    editor.rock_app.generate_rock(seed=1)
+    pygame.time.set_timer(pygame.QUIT, 1000, 1)
+    asyncio.run(editor.run())
+    for enabled in [False, True, False]:
+        profiler.enabled = enabled
+        editor.frame = 0
+        pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+        asyncio.run(editor.run())
+        print(f'frame profiler {"on " if enabled else "off"} {seconds * 1000 / editor.frame:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Per-frame memory churn and time of computing Rock.rel_dimensions,
+legacy Surface allocation + transform.rotate vs the analytic rotated size
+
+usage: python -m benchmarks.bench_rel_dimensions
+"""
+
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from src.globals import Globals
+from src.rock import get_rotated_size
+
+FRAMES = 600
+
+
+def legacy(angle):
+    s = pygame.Surface([Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT])
+    r = pygame.transform.rotate(s, angle)
+    # pixel buffers are allocated by SDL, outside of tracemalloc's view
+    return r.get_size(), s.get_pitch() * s.get_height() + r.get_pitch() * r.get_height()
+
+
+def analytic(angle):
+    return get_rotated_size(Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, angle), 0
+
+
+def run(f):
+    angles = [i % 360 for i in range(FRAMES)]
+    surface_bytes = 0
+    tracemalloc.start()
+    t = time.perf_counter()
+    for angle in angles:
+        surface_bytes += f(angle)[1]
+    elapsed = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / FRAMES * 1000, surface_bytes / FRAMES, peak
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode([1200, 800])
+    print(f'rock size {Globals.ROCK_WIDTH:.0f} x {Globals.ROCK_HEIGHT:.0f}, {FRAMES} frames')
+    print(f'{"path":>9} {"ms/frame":>9} {"surface bytes/frame":>20} {"python peak bytes":>18}')
+    for name, f in [('legacy', legacy), ('analytic', analytic)]:
+        ms, surface_bytes, peak = run(f)
+        print(f'{name:>9} {ms:>9.4f} {surface_bytes:>20,.0f} {peak:>18,}')
+
+
+if __name__ == '__main__':
+    main()
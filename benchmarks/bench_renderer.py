@@ -0,0 +1,74 @@
+"""
+Frame times of the editor with the display surface backend vs the SDL2 Renderer backend
+
+Every frame is drawn (no idle waiting, no frame cap), with nothing changing, the light being dragged
+(the rock is relit every frame) and the rock turning. Runs headless with SDL's software renderer.
+
+usage: python -m benchmarks.bench_renderer [seconds per scenario]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+SCENARIOS = ['static', 'light', 'angle']
+
+
+def run(renderer, seconds):
+    # one backend per interpreter, they can't share the display module
+    import pygame
+
+    from src.editor import Editor
+    from src.globals import Config, Globals
+
+    Config.RENDERER = renderer
+    Config.FPS = 0
+    Config.IDLE_REDRAW = False
+
+    class ScriptedEditor(Editor):
+        scenario = 'static'
+        frame = 0
+
+        def handle_lighting_pos(self):
+            self.frame += 1
+            if self.scenario == 'light':
+                self.light_edited_once = True
+                Globals.LIGHT_COORD = [300 + self.frame % 400, 200 + self.frame % 100]
+            elif self.scenario == 'angle':
+                Globals.ROCK_ANGLE = self.frame % 360
+            super().handle_lighting_pos()
+
+    editor = ScriptedEditor()
+    editor.rock_app.generate_rock(seed=1)
+    # let the rock settle in the center first
+    pygame.time.set_timer(pygame.QUIT, 1000, 1)
+    asyncio.run(editor.run())
+    for scenario in SCENARIOS:
+        editor.scenario = scenario
+        editor.frame = 0
+        Globals.ROCK_ANGLE = 0
+        pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+        asyncio.run(editor.run())
+        print(scenario, seconds * 1000 / editor.frame)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f'{"backend":>10} ' + ' '.join(f'{i + " ms":>10}' for i in SCENARIOS))
+    for name, renderer in [('surface', 0), ('renderer', 1)]:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_renderer', '--run', str(renderer), str(seconds)],
+            check=True, capture_output=True, text=True
+        ).stdout.splitlines()
+        times = dict(i.split() for i in output if i.split()[0] in SCENARIOS)
+        print(f'{name:>10} ' + ' '.join(f'{float(times[i]):>10.2f}' for i in SCENARIOS))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(bool(int(sys.argv[2])), float(sys.argv[3]))
+    else:
+        main()
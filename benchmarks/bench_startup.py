@@ -0,0 +1,87 @@
+"""
+Startup time of the editor, from launching main.py to its first frame and to its first rock
+
+The first frame is the empty editor, the first rock is generated in the background and appears
+later. Every run starts a fresh interpreter, the median times to the first frame and to the rock
+are checked against BUDGET_MS and ROCK_BUDGET_MS (published in the README) and the benchmark fails
+when either is over. Also shows when the imports and Editor() were done.
+
+usage: python -m benchmarks.bench_startup [runs] [--budget ms] [--rock-budget ms]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+BUDGET_MS = 500  # first frame, without the rock
+ROCK_BUDGET_MS = 1000  # first rock on screen
+STAGES = ['imports', 'editor', 'first frame', 'rock']
+
+
+def run(launched):
+    # what main.py does, stopping once the rock is on screen
+    import asyncio
+
+    from src.editor import Editor
+    imported = time.time()
+
+    import pygame
+
+    class FirstFrameEditor(Editor):
+        times = {}
+
+        def run_frame(self, events, dt):
+            super().run_frame(events, dt)
+            self.times.setdefault('first frame', time.time())
+            if self.rock_app.rock is not None:
+                self.times['rock'] = time.time()
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    editor = FirstFrameEditor()
+    created = time.time()
+    asyncio.run(editor.run())
+    times = {'imports': imported, 'editor': created, **editor.times}
+    for i in STAGES:
+        print(i, (times[i] - launched) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_startup', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('runs', type=int, nargs='?', default=10)
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help='ms from launch to the first (empty) frame')
+    parser.add_argument('--rock-budget', type=float, default=ROCK_BUDGET_MS, help='ms from launch to the first rock')
+    args = parser.parse_args()
+
+    results = {i: [] for i in STAGES}
+    for _ in range(args.runs):
+        launched = time.time()
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_startup', '--run', str(launched)],
+            check=True, capture_output=True, text=True
+        ).stdout.splitlines()
+        for line in output:
+            *name, ms = line.split()
+            if ' '.join(name) in results:
+                results[' '.join(name)].append(float(ms))
+    print(f'{"stage":>12} {"median ms":>10} {"max ms":>10}')
+    for i in STAGES:
+        print(f'{i:>12} {statistics.median(results[i]):>10.0f} {max(results[i]):>10.0f}')
+    over = False
+    for stage, budget in [('first frame', args.budget), ('rock', args.rock_budget)]:
+        median = statistics.median(results[stage])
+        print(f'{stage} {"within" if median <= budget else "over"} the {budget:.0f} ms budget')
+        over = over or median > budget
+    if over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(float(sys.argv[2]))
+    else:
+        main()
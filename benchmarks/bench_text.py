@@ -0,0 +1,66 @@
+"""
+Font rendering time per frame of the editor's idle widgets, with and without the text caches
+
+usage: python -m benchmarks.bench_text
+"""
+
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from src import globals
+from src.globals import Config, get_text, text_cache
+from src.ui import Button, SpinBoxNumeric
+
+FRAMES = 300
+
+
+class TimedFont:
+    def __init__(self, font):
+        self.font = font
+        self.calls = 0
+        self.elapsed = 0
+
+    def render(self, *args, **kwargs):
+        t = time.perf_counter()
+        text = self.font.render(*args, **kwargs)
+        self.elapsed += time.perf_counter() - t
+        self.calls += 1
+        return text
+
+
+def run(screen, objects, cached):
+    font = globals._font = TimedFont(globals._font.font if isinstance(globals._font, TimedFont) else globals._font)
+    text_cache.clear()
+    text_cache.max_bytes = Config.TEXT_CACHE_BYTES if cached else 0
+    for _ in range(FRAMES):
+        events = pygame.event.get()
+        for i in objects:
+            i.update(events, 1)
+        for i in objects:
+            i.draw(screen)
+    return font.calls / FRAMES, font.elapsed / FRAMES * 1000
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode([1200, 800])
+    get_text('')
+    objects = [Button('Generate'), Button('Settings'), Button('Export'), SpinBoxNumeric(0, 360)]
+    print(f'{"text cache":>10} {"renders/frame":>14} {"font ms/frame":>14}')
+    button_text, spin_box_text = Button.text, SpinBoxNumeric.text
+    # the label properties as they were before: render on every access
+    Button.text = property(lambda self: get_text(self.name, 'black'))
+    SpinBoxNumeric.text = property(lambda self: get_text(self.get_text(), 'white'))
+    calls, ms = run(screen, objects, False)
+    print(f'{"off":>10} {calls:>14.2f} {ms:>14.4f}')
+    Button.text, SpinBoxNumeric.text = button_text, spin_box_text
+    calls, ms = run(screen, objects, True)
+    print(f'{"on":>10} {calls:>14.2f} {ms:>14.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Peak memory and time of a very large PNG export, one full-size surface vs the tiled streaming export
+
+usage: python -m benchmarks.bench_tiled_export
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+SCALE = 40  # a 400 x 300 rock becomes roughly 16k x 12k pixels
+POINTS = 2_000
+RUNS = [
+    ('surface', 0, 0, False),
+    ('tiled', 512, 0, False),
+    ('tiled, 4 threads', 512, 4, False),
+    ('tiled, 4 processes', 512, 4, True),
+]
+
+
+def run(tile_size, workers, processes, filename):
+    # every export runs in a fresh interpreter so the peak resident memory belongs to it alone
+    import pygame
+
+    from src.rock import Rock
+    from src.tiled_export import export_png_tiled
+
+    rock = Rock(400, 300, POINTS, seed=1)
+    rock.angle = 30
+    key = rock.get_export_key(light=(-200, -150), color='red', lighting=True)
+    t = time.perf_counter()
+    if tile_size:
+        export_png_tiled(rock, filename, SCALE, tile_size, workers, processes, key)
+    else:
+        pygame.image.save(rock.rasterize(key, SCALE)[0], filename, 'png')
+    elapsed = time.perf_counter() - t
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def main():
+    print(f'{"export":>20} {"seconds":>8} {"peak MB":>8} {"file MB":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'rock.png')
+        for name, tile_size, workers, processes in RUNS:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_tiled_export', str(tile_size), str(workers),
+                 str(int(processes)), filename],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            elapsed, peak = float(output[-2]), int(output[-1])
+            print(f'{name:>20} {elapsed:>8.2f} {peak / 1024:>8.0f} {os.path.getsize(filename) / 2 ** 20:>8.1f}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]), int(sys.argv[2]), bool(int(sys.argv[3])), sys.argv[4])
+    else:
+        main()
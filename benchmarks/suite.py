@@ -0,0 +1,277 @@
+"""
+Headless benchmark suite of the generation, triangulation, lighting, export and UI hot paths
+
+Every case is run with fixed seeds and swept over point counts or surface sizes, the results are
+written as JSON so that runs from different commits can be compared.
+
+usage: python -m benchmarks.suite [-o results.json] [--compare baseline.json] [-k filter] [--quick]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+import scipy
+from scipy.spatial import ConvexHull, Delaunay
+
+from src.app import RockApp
+from src.globals import Config, Globals, get_text, text_cache
+from src.rock import Point, Rock
+from src.ui import ColorPicker
+
+SEED = 1234
+POINT_COUNTS = [100, 1_000, 10_000, 100_000]
+DRAW_POINT_COUNTS = [25, 1_000, 10_000]
+ROCK_SIZES = [(300, 200), (700, 500)]
+GRADIENT_SIZES = [(100, 60), (250, 150), (500, 300)]
+SLIDER_WIDTHS = [250, 500, 1000]
+TEXT_LENGTHS = [8, 64, 256]
+
+_cases = []
+_directory = None  # where the export cases write their files
+
+
+def case(name, params):
+    """
+    Registers a benchmark: the decorated function takes the params and returns the callable to time
+    """
+
+    def register(setup):
+        _cases.append((name, params, setup))
+        return setup
+
+    return register
+
+
+def get_case_name(name, params):
+    return f'{name}[{",".join(f"{i}={j}" for i, j in params.items())}]'
+
+
+def measure(f, min_time, min_runs=3, max_runs=1000):
+    """
+    Runs f until it ran at least min_runs times and for at least min_time seconds
+    :return: run times in milliseconds
+    """
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or (time.perf_counter() - start < min_time and len(times) < max_runs):
+        t = time.perf_counter()
+        f()
+        times.append((time.perf_counter() - t) * 1000)
+    return times
+
+
+def get_rock(n, size=(700, 500)):
+    rock = Rock(*size, n, Point(600, 400), seed=SEED)
+    rock.angle = 30
+    return rock
+
+
+@case('generate_rock_points', [{'points': i} for i in POINT_COUNTS])
+def bench_generate_rock_points(points):
+    return lambda: Rock.generate_rock_points(700, 500, points, SEED)
+
+
+@case('delaunay', [{'points': i} for i in POINT_COUNTS])
+def bench_delaunay(points):
+    rock_points = Rock.generate_rock_points(700, 500, points, SEED)
+    return lambda: Delaunay(rock_points)
+
+
+@case('convex_hull', [{'points': i} for i in POINT_COUNTS])
+def bench_convex_hull(points):
+    rock_points = Rock.generate_rock_points(700, 500, points, SEED)
+    return lambda: ConvexHull(rock_points)
+
+
+def bench_draw(points, size, lighting, cached=False):
+    screen = pygame.display.get_surface()
+    rock = get_rock(points, [int(i) for i in size.split('x')])
+
+    def draw():
+        Globals.LIGHTING = lighting
+        Globals.LIGHT_COORD = [300, 200]
+        if not cached:
+            rock.invalidate()
+        rock.draw(screen)
+
+    return draw
+
+
+draw_params = [{'points': i, 'size': f'{w}x{h}'} for i in DRAW_POINT_COUNTS for w, h in ROCK_SIZES]
+case('rock_draw_lit', draw_params)(lambda points, size: bench_draw(points, size, True))
+case('rock_draw_unlit', draw_params)(lambda points, size: bench_draw(points, size, False))
+case('rock_draw_cached', [{'points': 1_000, 'size': '700x500'}])(
+    lambda points, size: bench_draw(points, size, True, cached=True)
+)
+
+
+def get_app(points):
+    Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, Globals.ROCK_POINTS = 700, 500, points
+    Globals.LIGHTING = True
+    app = RockApp()
+    app.generate_rock(SEED)
+    app.rock.angle = 30
+    app.rock.pos = 0, 0
+    Globals.LIGHT_COORD = [-350, -250]
+    return app
+
+
+@case('export_json', [{'points': i} for i in DRAW_POINT_COUNTS])
+def bench_export_json(points):
+    app = get_app(points)
+    return lambda: app.export_json(os.path.join(_directory, 'rock.json'))
+
+
+@case('export_png', [{'points': i, 'scale': j} for i in DRAW_POINT_COUNTS for j in [1, 4]])
+def bench_export_png(points, scale):
+    app = get_app(points)
+    return lambda: app.export_png(os.path.join(_directory, 'rock.png'), scale)
+
+
+def bench_gradient(size, cached):
+    w, h = [int(i) for i in size.split('x')]
+    rng = random.Random(SEED)
+
+    def gradient():
+        # a new hue every time, or the same one as while the slider isn't moving
+        if not cached:
+            ColorPicker.gradient_cache.clear()
+        color = pygame.Color(0)
+        color.hsva = rng.randrange(360) if not cached else 0, 100, 100, 100
+        ColorPicker.get_gradient(w, h, color)
+
+    return gradient
+
+
+gradient_params = [{'size': f'{w}x{h}'} for w, h in GRADIENT_SIZES]
+case('get_gradient', gradient_params)(lambda size: bench_gradient(size, False))
+case('get_gradient_cached', gradient_params)(lambda size: bench_gradient(size, True))
+
+
+@case('slider_image', [{'width': i} for i in SLIDER_WIDTHS])
+def bench_slider_image(width):
+    return lambda: ColorPicker.slider_image(width, 20)
+
+
+def bench_text(length, cached):
+    text = ''.join(random.Random(SEED).choices('abcdefghijklmnopqrstuvwxyz ', k=length))
+
+    def render():
+        if not cached:
+            text_cache.clear()
+        get_text(text, 'white')
+
+    return render
+
+
+text_params = [{'length': i} for i in TEXT_LENGTHS]
+case('get_text', text_params)(lambda length: bench_text(length, False))
+case('get_text_cached', text_params)(lambda length: bench_text(length, True))
+
+
+def get_meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'pygame': pygame.version.ver,
+        'sdl': '.'.join(map(str, pygame.get_sdl_version())),
+        'seed': SEED
+    }
+
+
+def run(name_filter=None, min_time=0.5, quick=False):
+    results = {}
+    for name, params_list, setup in _cases:
+        for params in params_list:
+            key = get_case_name(name, params)
+            if name_filter and name_filter not in key:
+                continue
+            if quick and any(i == 'points' and j > 10_000 for i, j in params.items()):
+                continue
+            random.seed(SEED)
+            f = setup(**params)
+            f()  # warm up
+            times = measure(f, min_time)
+            results[key] = {
+                'name': name,
+                'params': params,
+                'runs': len(times),
+                'min_ms': min(times),
+                'median_ms': statistics.median(times),
+                'mean_ms': statistics.fmean(times)
+            }
+            print(f'{key:<55} {results[key]["median_ms"]:>10.3f} ms  ({len(times)} runs)', flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the change of every case against a baseline run, returns the cases slower than threshold
+    """
+    regressions = []
+    print(f'\n{"case":<55} {"baseline ms":>12} {"ms":>10} {"ratio":>7}')
+    for key, result in results.items():
+        if key not in baseline['results']:
+            continue
+        before = baseline['results'][key]['median_ms']
+        ratio = result['median_ms'] / before if before else float('inf')
+        flag = '  slower' if ratio > threshold else '  faster' if ratio < 1 / threshold else ''
+        print(f'{key:<55} {before:>12.3f} {result["median_ms"]:>10.3f} {ratio:>7.2f}{flag}')
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    global _directory
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='median time ratio counted as a regression (exit code 1)')
+    parser.add_argument('-k', '--filter', help='only run cases whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to spend on each case')
+    parser.add_argument('--quick', action='store_true', help='skip the cases with more than 10000 points')
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    pygame.display.set_mode([Config.W, Config.H])
+    with tempfile.TemporaryDirectory() as _directory:
+        results = run(args.filter, args.min_time, args.quick)
+    data = {'meta': get_meta(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(data, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if regressions := compare(results, baseline, args.threshold):
+            print(f'\n{len(regressions)} cases slower than {args.threshold}x the baseline')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,19 @@
+import copy
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pygame
 
-from src.globals import BaseStructure, Config, Globals
+from src.globals import BaseStructure, Config, Events, Globals, get_text
 from pygame.math import clamp
 
-from src.rock import Rock, Point
+from src.physics import get_physics_properties
+from src.profiler import profiler
+from src.rock import Rock, rotate_points
+from src.rock_io import load_rock, save_npz
+from src.sprite_baker import save_rotation_sheet
+from src.tiled_export import export_png_tiled
 
 
 class App(BaseStructure):
@@ -17,6 +25,7 @@ class App(BaseStructure):
         self.rect = pygame.Rect(*rel_rect)
         self.name = name
         self.center_focused = False
+        self._last_rect = self.rect.copy()
 
     def resize_to(self, width, height):
         self.rect.width = width
@@ -26,7 +35,19 @@ class App(BaseStructure):
         mx, my = pygame.mouse.get_pos()
         return mx - self.rect.x, my - self.rect.y
 
+    def needs_redraw(self):
+        # still moving or resizing
+        return self.rect != self._last_rect
+
+    def get_dirty_rect(self):
+        padding = 100
+        return self.rect.inflate(padding + 2, padding + 2)
+
+    def get_draw_state(self):
+        return Globals.LIGHTING_MOVE
+
     def update(self, events: list[pygame.event.Event], dt):
+        self._last_rect = self.rect.copy()
         if self.center_focused:
             pos = pygame.Vector2(*self.rect.topleft)
             target_pos = pygame.Vector2(Config.W // 2, Config.H // 2) - [self.rect.w // 2, self.rect.h // 2]
@@ -40,41 +61,168 @@ class App(BaseStructure):
 
 
 class RockApp(App):
-    def __init__(self):
+    def __init__(self, background=False):
         super().__init__('rock app', [-100, -100, Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT])
         self.center_focused = True
         self.rock = None
-        self.generate_rock()
-
-    def export_png(self, filename):
-        rect = pygame.Rect(0, 0, *self.rock.rel_dimensions).scale_by(1)
-        surf = pygame.Surface([*rect.size], pygame.SRCALPHA)
-        surf.fill(Config.BG_COLOR)
-        surf.set_colorkey(Config.BG_COLOR)
-        screen = pygame.display.get_surface()
-        screen.fill(Config.BG_COLOR)
-        self.rock.draw(screen)
-        surf.blit(screen, screen.get_rect(center=surf.get_rect().center))
+        # light, color and lighting of the exports, follows the editor unless frozen by snapshot
+        self.render_options = None
+        # seconds the current rock took to generate (None if imported)
+        self.generate_time = None
+        # why the last rock requested in the background couldn't be generated, shown in the status
+        self.generate_error = None
+        self._generator = None
+        self._generation = None
+        self._status_label = None, None
+        if background:
+            # the editor opens while its first rock is generated, instead of waiting for SciPy to load
+            self.request_rock()
+        else:
+            self.generate_rock()
+
+    def get_render_options(self):
+        if self.render_options is not None:
+            return self.render_options
+        x, y = self.rock.pos
+        return {
+            'light': (Globals.LIGHT_COORD[0] - x, Globals.LIGHT_COORD[1] - y),
+            'color': Globals.ROCK_COLOR,
+            'lighting': Globals.LIGHTING
+        }
+
+    def snapshot(self):
+        """
+        A copy of the app exporting the rock as it is now, for exports running on another thread
+        while the editor goes on changing the rock and the light
+        """
+        app = copy.copy(self)
+        app.rock = copy.copy(self.rock)
+        app.render_options = self.get_render_options()
+        return app
+
+    def export_png(self, filename, scale=1.0, tile_size=None, workers=0):
+        if tile_size:
+            # very large renders are streamed to the file tile by tile instead of drawn on one surface
+            key = self.rock.get_export_key(**self.get_render_options())
+            export_png_tiled(self.rock, filename, scale, tile_size, workers, key=key)
+            return
+        # rendered offscreen with real transparency, works without a display
+        surf, _ = self.rock.render(scale, **self.get_render_options())
         pygame.image.save(surf, filename, 'png')
 
-    def export_json(self, filename):
-        points = [[*Point(i).rotate(self.rock.angle)] for i in self.rock.points]
-        simplices = [[int(j) for j in i] for i in self.rock.tri.simplices]
+    def export_json(self, filename, physics=False):
+        points = rotate_points(self.rock.points, self.rock.angle)
+        simplices = [[int(j) for j in i] for i in self.rock.simplices]
         # print(type(simplices), type(simplices[0][0]))
         data = {
-            'points': points,
+            'points': points.tolist(),
             'simplices': simplices,
             'size': self.rock.size,
-            'angle': self.rock.angle
+            'angle': self.rock.angle,
+            'seed': self.rock.seed
         }
+        if physics:
+            # area, centroid, inertia and collision hull, so loading them is just a read
+            data['physics'] = get_physics_properties(points, self.rock.simplices, self.rock.hull)
         with open(filename, 'w') as f:
             f.write(json.dumps(data, indent=2))
 
-    def generate_rock(self):
-        self.rock = Rock(Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, Globals.ROCK_POINTS, self.rect.center)
+    def export_npz(self, filename, physics=False):
+        # float32 points and int32 simplices, a fraction of the size of the JSON and much faster to load
+        save_npz(filename, self.rock, physics)
+
+    def export_sprite_sheet(self, filename, frames=None, scale=1.0):
+        # the rock relit at every angle, readable by SpriteSheet / LoopingSpriteSheet
+        return save_rotation_sheet(self.rock, filename, frames or Config.SPRITE_SHEET_FRAMES, scale=scale,
+                                   **self.get_render_options())
+
+    @staticmethod
+    def _generate(width, height, num_points, position, seed):
+        start = time.perf_counter()
+        rock = Rock(width, height, num_points, position, seed=seed)
+        return rock, time.perf_counter() - start
+
+    def _generate_rendered(self, width, height, num_points, seed):
+        rock, elapsed = self._generate(width, height, num_points, self.rect.center, seed)
+        # rasterized where the rock and the light are now, it's drawn right away unless they move meanwhile
+        rock.angle = Globals.ROCK_ANGLE
+        rock.update_render()
+        return rock, elapsed
+
+    def generate_rock(self, seed=None):
+        self.cancel_generation()
+        self.rock, self.generate_time = self._generate(
+            Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, Globals.ROCK_POINTS, self.rect.center, seed
+        )
+        self.generate_error = None
+
+    def request_rock(self, seed=None):
+        """
+        Generates a new rock on a worker thread, the current one stays until the new one is ready
+
+        A request still waiting for the worker is cancelled by the next one, the result of one
+        already running is dropped. Events.ROCK_GENERATED is posted when a rock is ready.
+        """
+        if self._generator is None:
+            self._generator = ThreadPoolExecutor(1, thread_name_prefix='generate')
+        self.cancel_generation()
+        future = self._generator.submit(
+            self._generate_rendered, Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, Globals.ROCK_POINTS, seed
+        )
+        future.add_done_callback(self._generated)
+        self._generation = future
+
+    def _generated(self, future):
+        # wakes the editor's idle loop, the rock itself is picked up by update
+        if not future.cancelled():
+            self.post(Events.ROCK_GENERATED)
+
+    def cancel_generation(self):
+        if self._generation is not None:
+            self._generation.cancel()
+            self._generation = None
+
+    def import_rock(self, filename, index=0):
+        # the editor's settings follow the imported rock, so it's edited like a generated one
+        rock = load_rock(filename, index, self.rect.center)
+        # only once the file is loaded, a rock still being generated is kept if it can't be
+        self.cancel_generation()
+        self.rock = rock
+        self.generate_time = None
+        self.generate_error = None
+        Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT = self.rock.size
+        Globals.ROCK_POINTS = len(self.rock.points) - 1
+        Globals.ROCK_ANGLE = self.rock.angle
+
+    def get_status(self):
+        if self._generation is not None:
+            return 'generating...'
+        if self.generate_error is not None:
+            return f'could not generate the rock: {self.generate_error}'
+        if self.rock is None:
+            return 'no rock'
+        if self.generate_time is None:
+            return f'{len(self.rock.points) - 1} points'
+        return f'{len(self.rock.points) - 1} points in {self.generate_time * 1000:.0f} ms'
+
+    def get_status_label(self):
+        status = self.get_status()
+        if self._status_label[0] != status:
+            self._status_label = status, pygame.transform.smoothscale_by(get_text(status, 'white'), 0.5)
+        return self._status_label[1]
 
     def update(self, events: list[pygame.event.Event], dt):
         super().update(events, dt)
+        if self._generation is not None and self._generation.done():
+            future, self._generation = self._generation, None
+            try:
+                self.rock, self.generate_time = future.result()
+                self.generate_error = None
+            except Exception as e:
+                # the current rock stays, the first line of the error is shown in the status instead
+                self.generate_error = (str(e).splitlines() or [type(e).__name__])[0]
+        if self.rock is None:
+            return
         # self.rock.angle += dt
         # self.rock.angle %= 360
         self.rock.angle = Globals.ROCK_ANGLE
@@ -82,7 +230,22 @@ class RockApp(App):
         self.resize_to(*self.rock.rel_dimensions)
         self.rock.pos = self.rect.center
 
+    def get_dirty_rect(self):
+        if self.rock is None:
+            return super().get_dirty_rect()
+        return super().get_dirty_rect().union(self.rock.get_dirty_rect())
+
+    def get_draw_state(self):
+        rock_state = None if self.rock is None else self.rock.get_draw_state()
+        return super().get_draw_state(), self.rock, rock_state, self.get_status()
+
     def draw(self, screen: pygame.Surface):
         if not Globals.LIGHTING_MOVE:
             super().draw(screen)
-        self.rock.draw(screen)
+            padding = 100
+            frame = self.rect.inflate(padding, padding)
+            screen.blit(self.get_status_label(), [frame.x + 10, frame.y + 8])
+        if self.rock is None:
+            return
+        with profiler.section(self.rock, 'draw'):
+            self.rock.draw(screen)
@@ -0,0 +1,104 @@
+"""
+Texture atlases: many rendered rocks bin-packed into a few images of a fixed maximum size
+
+An atlas named rocks is written as
+
+    rocks_0.png, rocks_1.png, ...   the atlas pages
+    rocks.rocks                     geometry of every rock (see src.rock_io)
+    rocks.json                      the manifest:
+        {
+            "pages": ["rocks_0.png", ...],
+            "geometry": "rocks.rocks",
+            "rocks": [{"page": 0, "rect": [x, y, w, h], "offset": [dx, dy], "index": 0,
+                       "seed": ..., "size": [w, h], "angle": ...}, ...]
+        }
+
+where offset is the topleft of the rect relative to the rock's center and index is the rock's
+position in the geometry file. src.utils.TextureAtlas loads it with one texture per page.
+"""
+
+import json
+from pathlib import Path
+
+import pygame
+
+from src.rock_io import BatchWriter, get_export_data
+
+MAX_SIZE = 2048
+PADDING = 2  # transparent pixels between rocks, so filtering never bleeds into a neighbour
+
+
+def pack_rects(sizes, max_size=MAX_SIZE, padding=PADDING):
+    """
+    Shelf packing of rectangles into as few pages as possible, tallest rectangles first
+
+    :param sizes: (w, h) of every rectangle
+    :return: (page, x, y) of every rectangle and the used (w, h) of every page
+    """
+    positions = [None] * len(sizes)
+    pages = []  # [shelves as [y, height, next x], bottom, width]
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        w, h = sizes[i]
+        if w > max_size or h > max_size:
+            raise ValueError(f'a {w}x{h} image does not fit into a {max_size}x{max_size} atlas')
+        for p, page in enumerate(pages):
+            shelves, bottom, width = page
+            shelf = next((s for s in shelves if s[1] >= h and s[2] + w <= max_size), None)
+            if shelf is None and bottom + h <= max_size:
+                shelf = [bottom, h, 0]
+                shelves.append(shelf)
+                page[1] = bottom + h + padding
+            if shelf is not None:
+                break
+        else:
+            p, shelf = len(pages), [0, h, 0]
+            page = [[shelf], h + padding, 0]
+            pages.append(page)
+        positions[i] = p, shelf[2], shelf[0]
+        page[2] = max(page[2], shelf[2] + w)
+        shelf[2] += w + padding
+    return positions, [(width, bottom - padding) for _, bottom, width in pages]
+
+
+def save_atlas(images, filename, max_size=MAX_SIZE, padding=PADDING, geometry=None):
+    """
+    Packs rendered rocks into atlas pages and writes them with their manifest
+
+    :param images: (surface, offset of its topleft from the rock's center) of every rock
+    :param filename: path of the manifest, the pages and geometry file are written next to it
+    :param geometry: exported geometry of every rock (see rock_io.get_export_data), stored in the geometry file
+    :return: the manifest
+    """
+    filename = Path(filename)
+    images = list(images)
+    positions, page_sizes = pack_rects([surf.get_size() for surf, _ in images], max_size, padding)
+    pages = [pygame.Surface(size, pygame.SRCALPHA) for size in page_sizes]
+    rocks = []
+    for (surf, offset), (page, x, y) in zip(images, positions):
+        pages[page].blit(surf, (x, y))
+        rocks.append({'page': page, 'rect': [x, y, *surf.get_size()], 'offset': list(offset)})
+    names = [f'{filename.stem}_{i}.png' for i in range(len(pages))]
+    for name, page in zip(names, pages):
+        pygame.image.save(page, filename.with_name(name), 'png')
+    manifest = {'pages': names, 'geometry': None, 'rocks': rocks}
+    if geometry is not None:
+        manifest['geometry'] = filename.with_suffix('.rocks').name
+        with BatchWriter(filename.with_suffix('.rocks')) as batch:
+            for i, (rock, data) in enumerate(zip(rocks, geometry)):
+                batch.add_data(data)
+                rock.update({
+                    'index': i, 'seed': int(data['seed']) if 'seed' in data else None, 'size': data['size'].tolist(),
+                    'angle': float(data['angle'])
+                })
+    with open(filename.with_suffix('.json'), 'w') as f:
+        f.write(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def save_rock_atlas(rocks, filename, max_size=MAX_SIZE, scale=1.0, padding=PADDING, **kwargs):
+    """
+    Renders rocks (see Rock.render for the keyword arguments) and packs them into an atlas
+    """
+    rocks = list(rocks)
+    images = [rock.render(scale, **kwargs) for rock in rocks]
+    return save_atlas(images, filename, max_size, padding, [get_export_data(rock) for rock in rocks])
@@ -0,0 +1,101 @@
+"""
+Where the frames of the editor and its dialogs end up
+
+SurfaceBackend draws on the display surface with the software Compositor (the default),
+RendererBackend composes cached textures with an SDL2 Renderer (Config.RENDERER), which works
+with any of SDL's render drivers, including the software one on a headless machine.
+"""
+
+import pygame
+from pygame._sdl2.video import Renderer, Window
+
+from src.compositor import Compositor, TextureCompositor
+from src.globals import Config
+from src.profiler import profiler
+
+_backend = None
+
+
+class SurfaceBackend:
+    """
+    Draws on the display surface and pushes the changed regions to the window
+    """
+
+    def __init__(self, size, title, icon):
+        pygame.display.set_mode(size, pygame.RESIZABLE)
+        pygame.display.set_caption(title)
+        pygame.display.set_icon(icon)
+
+    @staticmethod
+    def get_surface():
+        return pygame.display.get_surface()
+
+    @staticmethod
+    def get_window_size():
+        return pygame.display.get_window_size()
+
+    @staticmethod
+    def create_compositor():
+        return Compositor()
+
+    def present(self, compositor: Compositor, layers, background):
+        screen = self.get_surface()
+        if Config.DIRTY_RECTS:
+            with profiler.section('compose'):
+                rects = compositor.draw(screen, layers, background)
+            with profiler.section('display.update'):
+                pygame.display.update(rects)
+            return
+        with profiler.section('compose'):
+            screen.fill(background)
+            for i in layers:
+                i.draw(screen)
+        with profiler.section('display.update'):
+            pygame.display.update()
+        compositor.add_pixels([screen.get_rect()])
+
+
+class RendererBackend:
+    """
+    Draws every layer into its own texture and composes the frame with an SDL2 Renderer
+    """
+
+    def __init__(self, size, title, icon):
+        self.window = Window(title, size, resizable=True)
+        self.window.set_icon(icon)
+        self.renderer = Renderer(self.window)
+        self._surface = None
+
+    def get_surface(self):
+        # layers are drawn onto this transparent, window-sized surface before being uploaded
+        if self._surface is None or self._surface.get_size() != self.window.size:
+            self._surface = pygame.Surface(self.window.size, pygame.SRCALPHA)
+        return self._surface
+
+    def get_window_size(self):
+        return self.window.size
+
+    def create_compositor(self):
+        return TextureCompositor(self.renderer)
+
+    def present(self, compositor: TextureCompositor, layers, background):
+        with profiler.section('compose'):
+            rects = compositor.draw(self.get_surface(), layers, background)
+        if rects is not None:
+            with profiler.section('renderer.present'):
+                self.renderer.present()
+
+
+def init_backend(size, title, icon):
+    global _backend
+    _backend = (RendererBackend if Config.RENDERER else SurfaceBackend)(size, title, icon)
+    return _backend
+
+
+def get_backend():
+    return _backend
+
+
+def get_window_size():
+    # the display module has no window of its own when drawing through a Renderer
+    return pygame.display.get_window_size() if _backend is None else _backend.get_window_size()
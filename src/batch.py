@@ -0,0 +1,160 @@
+"""
+Headless batch generation of rocks
+
+usage: python -m src.batch -n 1000 --width 200:400 --height 150:300 --points 25:100 -o rocks
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+_app = None
+
+
+def _init_worker(cache_dir):
+    global _app
+    # rocks are rendered offscreen, the dummy driver only makes sure no window can ever be opened
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    from src.app import RockApp
+    from src.rock import rock_cache
+
+    rock_cache.directory = cache_dir
+    _app = RockApp()
+
+
+def _generate(job):
+    import pygame
+
+    from src.globals import Globals
+    from src.rock import get_rotated_size
+    from src.rock_io import get_export_data
+
+    index, width, height, num_points, seed, angle, color, scale, physics, frames, output, formats = job
+    Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, Globals.ROCK_POINTS = width, height, num_points
+    Globals.ROCK_ANGLE = angle
+    Globals.ROCK_COLOR = color
+    _app.generate_rock(seed)
+    rock = _app.rock
+    rock.angle = angle
+    rock.pos = 0, 0
+    rock.rel_dimensions = [*get_rotated_size(width, height, angle)]
+    # same default light position as the editor: the topleft of the rock's frame
+    Globals.LIGHT_COORD = pygame.Rect(0, 0, *rock.rel_dimensions).move_to(center=rock.pos).topleft
+    name = Path(output) / f'rock_{index:05d}'
+    if 'json' in formats:
+        _app.export_json(name.with_suffix('.json'), physics)
+    if 'png' in formats:
+        _app.export_png(name.with_suffix('.png'), scale)
+    if 'sheet' in formats:
+        _app.export_sprite_sheet(name.with_name(name.name + '_sheet.png'), frames, scale)
+    if 'npz' in formats:
+        _app.export_npz(name.with_suffix('.npz'), physics)
+    # rocks for the batch file and the atlas are sent back and written by the main process, in order
+    data = get_export_data(rock) if 'batch' in formats or 'atlas' in formats else None
+    image = None
+    if 'atlas' in formats:
+        surf, offset = rock.render(scale)
+        image = pygame.image.tobytes(surf, 'RGBA'), surf.get_size(), offset
+    return data, image
+
+
+def get_jobs(args):
+    rng = random.Random(args.seed)
+    jobs = []
+    for i in range(args.count):
+        jobs.append((
+            i,
+            rng.randint(*args.width),
+            rng.randint(*args.height),
+            rng.randint(*args.points),
+            rng.randrange(2 ** 32),
+            args.angle,
+            args.color,
+            args.scale,
+            args.physics,
+            args.frames,
+            args.output,
+            args.formats
+        ))
+    return jobs
+
+
+def get_parser():
+    def value_range(name):
+        def parse(value):
+            values = [int(i) for i in value.split(':')]
+            if len(values) == 1:
+                values *= 2
+            if len(values) != 2 or values[0] > values[1] or values[0] < 1:
+                raise argparse.ArgumentTypeError(f'invalid {name} range: {value}')
+            return values
+
+        return parse
+
+    parser = argparse.ArgumentParser(prog='python -m src.batch', description='Generate rocks without opening a window')
+    parser.add_argument('-n', '--count', type=int, default=10, help='number of rocks to generate')
+    parser.add_argument('--width', type=value_range('width'), default=[200, 400], help='width or MIN:MAX range')
+    parser.add_argument('--height', type=value_range('height'), default=[150, 300], help='height or MIN:MAX range')
+    parser.add_argument('--points', type=value_range('points'), default=[25, 100],
+                        help='number of points or MIN:MAX range')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducing the whole batch')
+    parser.add_argument('--angle', type=float, default=0, help='rotation of every rock in degrees')
+    parser.add_argument('--color', default='red', help='base color of the rocks')
+    parser.add_argument('--scale', type=float, default=1.0, help='scale of the exported images')
+    parser.add_argument('--physics', action='store_true',
+                        help='include area, centroid, inertia and collision hull in json/npz exports')
+    parser.add_argument('--formats', nargs='+', choices=['json', 'png', 'npz', 'batch', 'sheet', 'atlas'],
+                        default=['json', 'png'],
+                        help='batch packs every rock into a single rocks.rocks file, '
+                             'sheet bakes a rotation sprite sheet of every rock, '
+                             'atlas packs the images of all rocks into atlas_N.png pages with an atlas.json manifest')
+    parser.add_argument('--atlas-size', type=int, default=2048, help='maximum width and height of an atlas page')
+    parser.add_argument('--frames', type=int, default=36, help='number of angles in a sprite sheet')
+    parser.add_argument('--cache-dir', default=None, help='directory for caching generated rock geometry')
+    parser.add_argument('-o', '--output', default='rocks', help='output directory')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.points[0] < 5:
+        raise SystemExit('at least 5 points are required for a rock')
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    jobs = get_jobs(args)
+    workers = max(1, args.workers)
+    from src.rock_io import BatchWriter
+
+    t = time.perf_counter()
+    batch = BatchWriter(Path(args.output) / 'rocks.rocks') if 'batch' in args.formats else None
+    images, geometry = [], []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(args.cache_dir,)) as executor:
+        for data, image in executor.map(_generate, jobs, chunksize=max(1, len(jobs) // (workers * 4))):
+            if batch is not None:
+                batch.add_data(data)
+            if image is not None:
+                images.append(image)
+                geometry.append(data)
+    if batch is not None:
+        batch.close()
+    if images:
+        import pygame
+
+        from src.atlas import save_atlas
+
+        manifest = save_atlas(
+            [(pygame.image.frombuffer(pixels, size, 'RGBA'), offset) for pixels, size, offset in images],
+            Path(args.output) / 'atlas.json', args.atlas_size, geometry=geometry
+        )
+        print(f'packed {len(images)} rocks into {len(manifest["pages"])} {args.atlas_size}px atlas pages')
+    elapsed = time.perf_counter() - t
+    rate = len(jobs) / elapsed if elapsed else 0
+    print(f'generated {len(jobs)} rocks in {elapsed:.2f}s with {workers} workers: '
+          f'{rate:.1f} rocks/s, {rate / workers:.1f} rocks/s per core')
+
+
+if __name__ == '__main__':
+    main()
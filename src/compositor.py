@@ -0,0 +1,174 @@
+import pygame
+from pygame._sdl2.video import Texture
+
+
+class Compositor:
+    """
+    Redraws only the screen regions of layers that changed since the last frame
+
+    A layer is any BaseStructure; get_dirty_rect() is the region its draw touches
+    and get_draw_state() anything that changes what it draws (None means it always changes)
+    """
+
+    def __init__(self):
+        self._previous = {}
+        self._full_redraw = True
+        self.pixels_pushed = 0
+        self.total_pixels_pushed = 0
+        self.frames = 0
+
+    def invalidate(self):
+        self._full_redraw = True
+
+    @property
+    def stats(self):
+        return {
+            'pixels_pushed': self.pixels_pushed,
+            'average_pixels_pushed': self.total_pixels_pushed / self.frames if self.frames else 0,
+            'frames': self.frames
+        }
+
+    @staticmethod
+    def merge_rects(rects):
+        # overlapping rects are drawn once as their union
+        merged = []
+        for rect in rects:
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect = rect.union(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def add_pixels(self, rects):
+        self.pixels_pushed = sum(i.w * i.h for i in rects)
+        self.total_pixels_pushed += self.pixels_pushed
+        self.frames += 1
+
+    def draw(self, screen: pygame.Surface, layers, background):
+        """
+        Draws the changed regions of `layers` (in order) onto `screen`
+
+        :return: the list of rects that have to be passed to pygame.display.update
+        """
+        screen_rect = screen.get_rect()
+        current = {}
+        dirty = []
+        for layer in layers:
+            rect = layer.get_dirty_rect()
+            rect = screen_rect if rect is None else screen_rect.clip(rect)
+            state = layer.get_draw_state()
+            current[layer] = rect, state
+            previous = self._previous.pop(layer, None)
+            if state is None or previous != (rect, state):
+                dirty.append(rect)
+                if previous:
+                    dirty.append(previous[0])
+        # layers that are gone
+        dirty += [rect for rect, _ in self._previous.values()]
+        self._previous = current
+        if self._full_redraw:
+            dirty = [screen_rect]
+            self._full_redraw = False
+        dirty = self.merge_rects([i for i in dirty if i.w and i.h])
+        for rect in dirty:
+            screen.set_clip(rect)
+            screen.fill(background)
+            for layer in layers:
+                if current[layer][0].colliderect(rect):
+                    layer.draw(screen)
+        screen.set_clip(None)
+        self.add_pixels(dirty)
+        return dirty
+
+
+class TextureCompositor:
+    """
+    Compositor for the SDL2 Renderer backend: every layer is kept as a texture,
+    which is only redrawn and uploaded again when the layer's rect or draw state changes
+
+    The whole frame is then composed from the textures on the renderer
+    """
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self._textures = {}
+        self._frame = []
+        self.pixels_uploaded = 0
+        self.total_pixels_uploaded = 0
+        self.frames = 0
+
+    def invalidate(self):
+        self._textures.clear()
+        self._frame = []
+
+    @property
+    def stats(self):
+        return {
+            'pixels_pushed': self.pixels_uploaded,
+            'average_pixels_pushed': self.total_pixels_uploaded / self.frames if self.frames else 0,
+            'frames': self.frames,
+            'textures': len(self._textures)
+        }
+
+    def add_pixels(self, rects):
+        self.pixels_uploaded = sum(i.w * i.h for i in rects)
+        self.total_pixels_uploaded += self.pixels_uploaded
+        self.frames += 1
+
+    def get_texture(self, screen: pygame.Surface, layer, rect, state):
+        """
+        Cached texture of a layer, drawn onto the transparent `screen` and uploaded when it changed
+        """
+        cached = self._textures.get(layer)
+        if cached is not None and state is not None and cached[:2] == (rect, state):
+            return cached[2], False
+        screen.set_clip(rect)
+        screen.fill((0, 0, 0, 0))
+        layer.draw(screen)
+        screen.set_clip(None)
+        image = screen.subsurface(rect)
+        if cached is not None and cached[0].size == rect.size:
+            texture = cached[2]
+            texture.update(image)
+        else:
+            texture = Texture.from_surface(self.renderer, image)
+            texture.blend_mode = pygame.BLENDMODE_BLEND
+        self._textures[layer] = rect, state, texture
+        return texture, True
+
+    def draw(self, screen: pygame.Surface, layers, background):
+        """
+        Composes `layers` (in order) on the renderer, `screen` is the window-sized SRCALPHA surface
+        layers are drawn onto before being uploaded
+
+        :return: the rects that were uploaded, or None if nothing changed and the renderer wasn't drawn to
+        """
+        screen_rect = screen.get_rect()
+        uploaded = []
+        frame = []
+        previous = self._textures
+        self._textures = {}
+        for layer in layers:
+            rect = layer.get_dirty_rect()
+            rect = screen_rect if rect is None else screen_rect.clip(rect)
+            if not rect.w or not rect.h:
+                continue
+            cached = previous.pop(layer, None)
+            if cached is not None:
+                self._textures[layer] = cached
+            texture, changed = self.get_texture(screen, layer, rect, layer.get_draw_state())
+            if changed:
+                uploaded.append(rect)
+            frame.append((texture, rect))
+        # the last frame is still on the window if no layer changed, appeared or went away
+        if not uploaded and not previous and len(frame) == len(self._frame):
+            self.add_pixels([])
+            return None
+        self._frame = frame
+        self.renderer.draw_color = background
+        self.renderer.clear()
+        for texture, rect in frame:
+            texture.draw(dstrect=rect)
+        self.add_pixels(uploaded)
+        return uploaded
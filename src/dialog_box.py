@@ -1,43 +1,40 @@
 import abc
-import sys
+import asyncio
 
 import pygame
 from pygame.locals import *
 
-from src.globals import Config, BaseStructure, Events, get_text
+from src.backend import get_backend
+from src.globals import Config, BaseStructure, Events, get_text, set_cursor
+from src.profiler import TOGGLE_KEY, profiler
 from src.ui import Button, UI
 
+# dialogs shown with show_async, the last one is drawn by the editor's loop instead of the editor
+_dialogs = []
 
-# import multiprocessing
-# import atexit
-# import signal
+
+def get_dialog():
+    return _dialogs[-1] if _dialogs else None
 
 
 class DialogBox(BaseStructure):
     """
     Abstract class (needs to be inherited)
+
+    A dialog runs one frame at a time: show_async() puts it over the editor, whose loop draws its
+    frames and keeps running every other task while the dialog is open.
     """
 
     def __init__(self):
-        # self.result_queue = multiprocessing.Queue()
         self._argc = 0
-        self.window = pygame.display.get_surface()
-        # self.exit_flag = multiprocessing.Event()
-        self.running = True
+        self.window = get_backend().get_surface()
         self.back = Button('Back', action=self.exit_dialog, topleft=[10, 10])
-
-        # Set up signal handlers
-        # TODO: this is not working properly at the moment, need to make sure child process gets closed
-        # TODO: if parent process force stopped
-        # signal.signal(signal.SIGTERM, self._signal_handler)
-        # signal.signal(signal.SIGINT, self._signal_handler)
-
-    # def _signal_handler(self, signum, frame):
-    #     print(f"Received signal = {signum}, frame = {frame}. Setting exit flag.")
-    #     self.exit_flag.set()
+        self.compositor = get_backend().create_compositor()
+        self._closed = None
 
     def exit_dialog(self):
-        self.running = False
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
 
     @abc.abstractmethod
     def get_caption(self):
@@ -49,71 +46,74 @@ class DialogBox(BaseStructure):
     def get_result(self):
         return [None] * self.get_argc()
 
-    # def return_result(self):
-    #     self.result_queue.put(self.get_result())
-
-    def _dialog_process(self):
-        # pygame.init()
-        self.running = True
-        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-        # Pygame window settings
-        # width, height = Config.DEFAULT_DIALOG_BOX_SIZE
-        # screen = pygame.display.set_mode([width, height])
-        # window = Window.from_display_module()
-        # window.focus()
-        # pygame.display.set_caption(self.get_caption())
-        # screen = pygame.Surface([width, height])
-        window = pygame.display.get_surface()
-        clock = pygame.Clock()
-
-        while self.running:
-            mouse_hovered = False
-            events = pygame.event.get()
-            for event in events:
-                if event.type == QUIT:
-                    sys.exit(0)
-                elif event.type == KEYDOWN and event.key == pygame.K_ESCAPE:
-                    self.running = False
-                if event.type == Events.MOUSE_HOVERED:
-                    mouse_hovered = True
-                if event.type == pygame.WINDOWRESIZED:
-                    Config.W, Config.H = event.x, event.y
-                if mouse_hovered:
-                    if pygame.mouse.get_cursor() != pygame.SYSTEM_CURSOR_HAND:
-                        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_HAND)
-                else:
-                    if pygame.mouse.get_cursor() != pygame.SYSTEM_CURSOR_ARROW:
-                        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-
-            self.back.update(events, 1)
-            self.update(events, 1)
-            self.draw(window)
-            self.back.draw(window)
-            # self.draw(screen)
-            # window.blit(screen, screen.get_rect(center=window.get_rect().center))
-            pygame.display.update()
-            clock.tick(60)
-            # if self.exit_flag.is_set():
-            #     running = False
+    def open(self):
+        set_cursor(pygame.SYSTEM_CURSOR_ARROW)
+        self.compositor.invalidate()
+
+    def handle_events(self, events):
+        """
+        :return: False when the window was closed
+        """
+        mouse_hovered = False
+        for event in events:
+            if event.type == QUIT:
+                return False
+            elif event.type == KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.exit_dialog()
+            if event.type == Events.MOUSE_HOVERED:
+                mouse_hovered = True
+            if event.type == pygame.WINDOWRESIZED:
+                Config.W, Config.H = event.x, event.y
+            if event.type in [pygame.WINDOWRESIZED, pygame.WINDOWEXPOSED] or (
+                    event.type == KEYDOWN and event.key == TOGGLE_KEY):
+                self.compositor.invalidate()
+        set_cursor(pygame.SYSTEM_CURSOR_HAND if mouse_hovered else pygame.SYSTEM_CURSOR_ARROW)
+        profiler.handle_events(events)
+        return True
+
+    def run_frame(self, events, dt, overlays=()):
+        """
+        Handles, updates and draws a single frame of the dialog
+        :param overlays: layers drawn over the dialog (the editor's export list)
+        :return: False when the window was closed
+        """
+        with profiler.section('events'):
+            if not self.handle_events(events):
+                return False
+        with profiler.section(self.back, 'update'):
+            self.back.update(events, dt)
+        with profiler.section(self, 'update'):
+            self.update(events, dt)
+        get_backend().present(self.compositor, profiler.wrap([*self.get_layers(), *overlays, profiler.overlay]),
+                              Config.BG_COLOR)
+        return True
+
+    def get_layers(self):
+        # drawn in this order, the dialog itself is the background
+        return [self, self.back]
+
+    def get_draw_state(self):
+        return get_backend().get_window_size()
 
     def draw(self, screen: pygame.Surface):
         screen.fill(Config.BG_COLOR)
         # rect = screen.get_rect(center=self.window.get_rect().center)
         # pygame.draw.rect(screen, 'red', rect)
 
-    def show(self):
-        self._dialog_process()
+    async def show_async(self):
+        """
+        Shows the dialog over the editor until it's closed, frames are drawn by Editor.run
+        """
+        self._closed = asyncio.get_running_loop().create_future()
+        self.open()
+        _dialogs.append(self)
+        try:
+            await self._closed
+        finally:
+            _dialogs.remove(self)
+            self._closed = None
         return self.get_result()
 
-    # def show_multiprocess(self):
-    #     dialog_process = multiprocessing.Process(target=self._dialog_process)
-    #     dialog_process.daemon = True
-    #     dialog_process.start()
-    #
-    #     # wait until process complete
-    #     dialog_process.join()
-    #     return self.get_result()
-
 
 class MessageBox(DialogBox):
     def __init__(self, message):
@@ -136,6 +136,7 @@ class CustomDialogBox(DialogBox):
         self.message = message
         self.objects = kwargs
         self.total_length = ...
+        self.labels = []
 
     def get_caption(self):
         return self.message
@@ -143,22 +144,31 @@ class CustomDialogBox(DialogBox):
     def get_result(self):
         return self.objects.values()
 
-    def update(self, events: list[pygame.event.Event], dt):
-        for _, i in self.objects.items():
-            i.update(events, dt)
+    def get_layers(self):
+        return [*super().get_layers(), *self.objects.values()]
 
-    def draw(self, screen: pygame.Surface):
-        super().draw(screen)
+    def layout(self, screen: pygame.Surface):
         padding = 25
-        text = get_text(self.message, 'white', wraplength=int(Config.DEFAULT_DIALOG_BOX_SIZE[0] * 0.8))
-        screen.blit(text, text.get_rect(center=[screen.get_width() // 2, text.get_height() // 2 + padding]))
+        self.labels = []
         y = 100
         for i, j in self.objects.items():
             t = get_text(i + ":", 'white')
             rect = t.get_rect(topright=[screen.get_width() * 0.5 - padding, y])
-            screen.blit(t, rect)
+            self.labels.append([t, rect])
             obj = self.objects[i]
             obj.rect.topleft = [screen.get_width() * 0.5 + padding, rect.topleft[1]]
             y += max(rect.h, obj.rect.h) + padding / 2
+
+    def update(self, events: list[pygame.event.Event], dt):
+        self.layout(get_backend().get_surface())
         for _, i in self.objects.items():
-            i.draw(screen)
+            with profiler.section(i, 'update'):
+                i.update(events, dt)
+
+    def draw(self, screen: pygame.Surface):
+        super().draw(screen)
+        padding = 25
+        text = get_text(self.message, 'white', wraplength=int(Config.DEFAULT_DIALOG_BOX_SIZE[0] * 0.8))
+        screen.blit(text, text.get_rect(center=[screen.get_width() // 2, text.get_height() // 2 + padding]))
+        for t, rect in self.labels:
+            screen.blit(t, rect)
@@ -1,41 +1,89 @@
 import asyncio
 import os.path
-from tkinter.filedialog import asksaveasfilename
+import time
 
 import pygame.display
 
 from src.app import RockApp
+from src.backend import init_backend
 from src.dialog_box import *
-from src.globals import Globals
+from src.exports import ExportQueue, ExportStatus
+from src.globals import BaseStructure, Globals, fit_to_screen, get_screen_size, set_cursor
+from src.profiler import TOGGLE_KEY, profiler
+from src.rock import MIN_POINTS
+from src.rock_io import BatchReader
 from src.ui import *
 
 pygame.init()
 
 
+def askopenfilename(**kwargs):
+    # tkinter is only imported once a file dialog is opened, it adds to the startup time otherwise
+    from tkinter.filedialog import askopenfilename
+    return askopenfilename(**kwargs)
+
+
+def asksaveasfilename(**kwargs):
+    from tkinter.filedialog import asksaveasfilename
+    return asksaveasfilename(**kwargs)
+
+
+class LightIcon(BaseStructure):
+    """
+    The light source drawn over the rock, positioned at Globals.LIGHT_COORD
+    """
+
+    def __init__(self, image: pygame.Surface):
+        self.image = image
+
+    def get_dirty_rect(self):
+        if not Globals.LIGHTING:
+            return pygame.Rect(0, 0, 0, 0)
+        return self.image.get_rect(center=Globals.LIGHT_COORD)
+
+    def get_draw_state(self):
+        return Globals.LIGHTING
+
+    def draw(self, screen: pygame.Surface):
+        if Globals.LIGHTING:
+            screen.blit(self.image, self.get_dirty_rect())
+
+
 class Editor:
     def __init__(self):
-        self.screen = pygame.display.set_mode([Config.W, Config.H], pygame.RESIZABLE)
+        fit_to_screen()
+        self.backend = init_backend(
+            [Config.W, Config.H], 'PyRock2D', pygame.image.load(Config.ASSETS / 'images' / 'icon.png')
+        )
         # self.window = Window.from_display_module()
         # self.window.maximize()
-        pygame.display.set_caption('PyRock2D')
-        pygame.display.set_icon(pygame.image.load(Config.ASSETS / 'images' / 'icon.png'))
         pygame.key.set_repeat(500, 25)
         self.clock = pygame.time.Clock()
-        self.rock_app = RockApp()
+        self.rock_app = RockApp(background=True)
         self.angle_spin_box = SpinBoxNumeric(0, 360, action=self.change_angle)
         self.light = pygame.image.load(Config.ASSETS / 'images' / 'light.png')
+        self.light_icon = LightIcon(self.light)
+        self.compositor = self.backend.create_compositor()
+        self.exports = ExportQueue()
+        self.export_status = ExportStatus(self.exports)
 
         self.objects = [
             self.rock_app,
             # Button('create', None),
-            Button('Generate', action=self.rock_app.generate_rock),
+            Button('Generate', action=self.rock_app.request_rock),
             Button('Settings', action=self.settings),
             Button('Export', action=self.export),
+            Button('Import', action=self.import_rock),
             # Button('.json', None),
-            self.angle_spin_box
+            self.angle_spin_box,
+            self.export_status
         ]
         self.order_buttons()
         self.light_edited_once = False
+        # set when something outside of the objects changed and the next frame has to be drawn
+        self.dirty = True
+        # whether the last iteration of the loop ran a frame, only those post the objects' hover events
+        self.frame_ran = False
         # self.grab_cursor = pygame.Cursor((12, 12),
         #                                  pygame.transform.smoothscale(pygame.image.load(
         #                                      os.path.join('.', 'assets', 'images', 'cursor-drag.png')), [32, 32]))
@@ -43,37 +91,81 @@ class Editor:
     def change_angle(self):
         Globals.ROCK_ANGLE = self.angle_spin_box.value
 
-    def export(self):
+    async def export(self):
         box = CustomDialogBox(
             'export',
             json=Button('.json', action=self.export_json),
-            png=Button('.png', action=self.export_png)
+            png=Button('.png', action=self.export_png),
+            npz=Button('.npz', action=self.export_npz),
+            sheet=Button('sprite sheet', action=self.export_sprite_sheet)
         )
-        box.show()
+        await box.show_async()
+
+    async def import_rock(self):
+        files = [('Rocks', '*.json *.npz *.rocks'), ('JSON', '*.json'), ('NumPy archive', '*.npz'),
+                 ('Rock batch', '*.rocks')]
+        filename = askopenfilename(filetypes=files)
+        if not filename:
+            return
+        try:
+            index = 0
+            if filename.lower().endswith('.rocks'):
+                with BatchReader(filename) as reader:
+                    count = len(reader)
+                if not count:
+                    raise ValueError('the batch file contains no rocks')
+                b = Button('open', action=lambda: [b.__setattr__('opened', True), box.exit_dialog()])
+                b.opened = False
+                box = CustomDialogBox('Import', rock=SpinBoxNumeric(0, count - 1, 0), open=b)
+                spin_box, _ = await box.show_async()
+                if not b.opened:
+                    return
+                index = spin_box.value
+            self.rock_app.import_rock(filename, index)
+        except (OSError, ValueError, KeyError) as e:
+            await MessageBox(f'Could not import {os.path.basename(filename)}: {e}').show_async()
+            return
+        self.angle_spin_box.value = round(Globals.ROCK_ANGLE)
+
+    def submit_export(self, filename, export, *args):
+        # the file is picked on the UI thread, the rock is copied as it is now and written on an export thread
+        if self.rock_app.rock is None:
+            return
+        self.exports.submit(os.path.basename(filename), getattr(self.rock_app.snapshot(), export), filename, *args)
 
     def export_json(self):
         files = [('JSON', '*.json')]
         filename = asksaveasfilename(filetypes=files, defaultextension='.json')
         if filename:
-            self.rock_app.export_json(filename)
+            self.submit_export(filename, 'export_json', Config.EXPORT_PHYSICS)
+
+    def export_npz(self):
+        filename = asksaveasfilename(filetypes=[('NumPy archive', '*.npz')], defaultextension='.npz')
+        if filename:
+            self.submit_export(filename, 'export_npz', Config.EXPORT_PHYSICS)
+
+    def export_sprite_sheet(self):
+        filename = asksaveasfilename(filetypes=[('PNG', '*.png')], defaultextension='.png')
+        if filename:
+            self.submit_export(filename, 'export_sprite_sheet')
 
     def export_png(self):
         filename = asksaveasfilename(filetypes=[('PNG', '*.png')], defaultextension='.png')
         if filename:
-            self.rock_app.export_png(filename)
+            self.submit_export(filename, 'export_png')
 
-    def settings(self):
+    async def settings(self):
         b = Button('save', action=lambda: [b.__setattr__('saved', True)])
         b.saved = False
         box = CustomDialogBox(
             'Settings',
-            width=SpinBoxNumeric(0, Globals.SCREEN_WIDTH, self.rock_app.rect.w),
-            height=SpinBoxNumeric(0, Globals.SCREEN_HEIGHT, self.rock_app.rect.h),
-            points=SpinBoxNumeric(0, 1000, Globals.ROCK_POINTS),
+            width=SpinBoxNumeric(0, get_screen_size()[0], self.rock_app.rect.w),
+            height=SpinBoxNumeric(0, get_screen_size()[1], self.rock_app.rect.h),
+            points=SpinBoxNumeric(MIN_POINTS, 1000, Globals.ROCK_POINTS),
             color=ColorPicker(250, 150, initial_values=Globals.SLIDER_COORDS),
             save=b
         )
-        result = box.show()
+        result = await box.show_async()
         w, h, p, c, button = result
         saved = button.saved
         if saved:
@@ -92,7 +184,7 @@ class Editor:
                 i.rect.topleft = [x, padding[1]]
                 x += i.rect.w + 5
 
-    def handle_lighting_pos(self, surf: pygame.Surface):
+    def handle_lighting_pos(self):
         if not Globals.LIGHTING:
             return
         if not self.light_edited_once:
@@ -121,8 +213,6 @@ class Editor:
             self.light_edited_once = True
             Globals.LIGHT_COORD = [mx, my]
 
-        surf.blit(self.light, self.light.get_rect(center=Globals.LIGHT_COORD))
-
     # @staticmethod
     def handle_events(self, events):
         mouse_hovered = False
@@ -133,44 +223,97 @@ class Editor:
             #         return False
             if e.type == pygame.QUIT:
                 return False
+            if e.type == pygame.KEYDOWN and e.key == TOGGLE_KEY:
+                self.dirty = True
             if e.type == pygame.WINDOWRESIZED:
                 Config.W, Config.H = e.x, e.y
+            if e.type in [pygame.WINDOWRESIZED, pygame.WINDOWEXPOSED]:
+                self.dirty = True
             if e.type == Events.MOUSE_HOVERED:
                 mouse_hovered = True
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_l:
                     Globals.LIGHTING = not Globals.LIGHTING
+        profiler.handle_events(events)
         if mouse_hovered:
             # if mouse_clicked:
             #     pygame.mouse.set_cursor(self.grab_cursor)
             # else:
-            if pygame.mouse.get_cursor() != pygame.SYSTEM_CURSOR_HAND:
-                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_HAND)
-        else:
-            if pygame.mouse.get_cursor() != pygame.SYSTEM_CURSOR_ARROW:
-                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
+            set_cursor(pygame.SYSTEM_CURSOR_HAND)
+        elif self.frame_ran:
+            # without a frame, no hover event doesn't mean nothing is hovered, the cursor is kept
+            set_cursor(pygame.SYSTEM_CURSOR_ARROW)
 
         return True
 
+    def needs_redraw(self, events):
+        # events posted by the objects themselves (hovering) don't change anything on their own
+        if any(e.type not in [Events.MOUSE_HOVERED, Events.MOUSE_GRAB] for e in events):
+            return True
+        if self.dirty or Globals.LIGHTING_MOVE or profiler.overlay.needs_redraw():
+            return True
+        return any(i.needs_redraw() for i in self.objects)
+
+    def run_frame(self, events, dt):
+        if self.dirty:
+            # something outside of the objects changed (dialogs, window), redraw everything
+            self.compositor.invalidate()
+            self.dirty = False
+        # self.title_bar(events, self.screen)
+        for i in self.objects:
+            with profiler.section(i, 'update'):
+                i.update(events, dt)
+        with profiler.section('handle_lighting_pos'):
+            self.handle_lighting_pos()
+        layers = profiler.wrap([*self.objects, self.light_icon, profiler.overlay])
+        self.backend.present(self.compositor, layers, Config.BG_COLOR)
+
+    async def wait(self):
+        """
+        Sleeps until an event arrives or IDLE_TIMEOUT passes, without stalling the other tasks on the loop
+        """
+        await asyncio.sleep(0)
+        if len(asyncio.all_tasks()) > 1:
+            await asyncio.sleep(1 / Config.TARGET_FPS)
+            return pygame.event.poll()
+        return pygame.event.wait(Config.IDLE_TIMEOUT)
+
     async def run(self):
         dt = 1
+        pending = []
         while True:
             # Config.BG_COLOR = pygame.Color(Globals.ROCK_COLOR).lerp('black', 0.9)
             # print(Config.BG_COLOR)
-            events = pygame.event.get()
-            if not self.handle_events(events):
-                return
-            self.screen.fill(Config.BG_COLOR)
-            # self.title_bar(events, self.screen)
-            for i in self.objects:
-                i.update(events, dt)
-            for i in self.objects:
-                i.draw(self.screen)
-            self.handle_lighting_pos(self.screen)
-            pygame.display.update()
-            await asyncio.sleep(0)
+            start = time.perf_counter()
+            profiler.frame_start()
+            events = pending + pygame.event.get()
+            pending = []
+            if (dialog := get_dialog()) is not None:
+                # the dialog is drawn instead of the editor until it's closed, which redraws the editor
+                self.dirty = True
+                self.frame_ran = False
+                self.export_status.update(events, dt)
+                if not dialog.run_frame(events, dt, [self.export_status]):
+                    return
+            else:
+                with profiler.section('events'):
+                    if not self.handle_events(events):
+                        return
+                if Config.IDLE_REDRAW and not self.needs_redraw(events):
+                    # nothing to redraw, sleep until an event arrives instead of drawing the same frame again
+                    if (event := await self.wait()).type != pygame.NOEVENT:
+                        pending.append(event)
+                        self.clock.tick()  # the idle time shouldn't count towards dt
+                    self.frame_ran = False
+                    continue
+                self.run_frame(events, dt)
+                self.frame_ran = True
+            profiler.frame_end()
+            # the rest of the frame is waited out on the loop rather than in clock.tick, so the other tasks
+            # (dialogs, exports) keep running meanwhile
+            await asyncio.sleep(max(0.0, 1 / Config.FPS - (time.perf_counter() - start)) if Config.FPS else 0)
             try:
-                dt = Config.TARGET_FPS * self.clock.tick(Config.FPS) / 1000
+                dt = Config.TARGET_FPS * self.clock.tick() / 1000
             except ZeroDivisionError:
                 dt = 1
             dt = pygame.math.clamp(dt, 0.01, 10)
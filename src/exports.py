@@ -0,0 +1,135 @@
+"""
+Exports running on a thread pool next to the editor
+
+Every export is a job that is queued, exporting, done or failed. The threads post Events.EXPORT
+when a job starts and finishes, which wakes the editor's idle loop to show the new state.
+Threads rather than processes: the rock and its surfaces are shared instead of pickled, and the
+heavy parts (numpy, zlib, the PNG encoder) mostly run without the GIL.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from src.globals import BaseStructure, Config, Events, get_text
+
+QUEUED = 'queued'
+RUNNING = 'exporting'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    def __init__(self, name):
+        self.name = name
+        self.state = QUEUED
+        self.error = None
+        self.start = None
+        self.end = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.state in [DONE, FAILED]
+
+    @property
+    def elapsed(self):
+        if self.start is None:
+            return 0
+        return (self.end or time.perf_counter()) - self.start
+
+    def get_label(self):
+        if self.state == DONE:
+            return f'{self.name} done in {self.elapsed:.1f} s'
+        if self.state == FAILED:
+            return f'{self.name} failed: {self.error}'
+        return f'{self.name} {self.state}'
+
+
+class ExportQueue:
+    """
+    Runs up to `workers` exports at the same time, the rest wait for a free thread
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or Config.EXPORT_WORKERS
+        self.jobs = []
+        self._executor = None
+
+    def submit(self, name, f, *args, **kwargs):
+        """
+        Queues f(*args, **kwargs), which mustn't touch anything the editor keeps changing
+        (see RockApp.snapshot)
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='export')
+        job = ExportJob(name)
+        self.jobs.append(job)
+        job.future = self._executor.submit(self._run, job, f, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job, f, args, kwargs):
+        job.start = time.perf_counter()
+        job.state = RUNNING
+        BaseStructure.post(Events.EXPORT, job=job)
+        try:
+            f(*args, **kwargs)
+            job.state = DONE
+        except Exception as e:
+            job.error = e
+            job.state = FAILED
+        job.end = time.perf_counter()
+        BaseStructure.post(Events.EXPORT, job=job)
+
+    def get_expired(self):
+        now = time.perf_counter()
+        return [i for i in self.jobs if i.finished and now - i.end > Config.EXPORT_STATUS_TIME]
+
+    def remove_expired(self):
+        for i in self.get_expired():
+            self.jobs.remove(i)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait)
+            self._executor = None
+
+
+class ExportStatus(BaseStructure):
+    """
+    The queued, running and recently finished exports, listed in the bottom right corner
+    """
+
+    def __init__(self, queue: ExportQueue, scale=0.6):
+        self.queue = queue
+        self.scale = scale
+        self._labels = []
+
+    def needs_redraw(self):
+        # finished exports are taken off the list after a while, without any event
+        return bool(self.queue.get_expired())
+
+    def update(self, events: list[pygame.event.Event], dt):
+        self.queue.remove_expired()
+        self._labels = [(i.get_label(), 'red' if i.state == FAILED else 'white') for i in self.queue.jobs]
+
+    def get_dirty_rect(self):
+        if not self._labels:
+            return pygame.Rect(0, 0, 0, 0)
+        texts = [get_text(*i) for i in self._labels]
+        w = max(i.get_width() for i in texts) * self.scale
+        h = sum(i.get_height() for i in texts) * self.scale
+        return pygame.Rect(Config.W - w - 10, Config.H - h - 10, w, h)
+
+    def get_draw_state(self):
+        return self._labels
+
+    def draw(self, screen: pygame.Surface):
+        rect = self.get_dirty_rect()
+        y = rect.y
+        for label in self._labels:
+            text = pygame.transform.smoothscale_by(get_text(*label), self.scale)
+            screen.blit(text, text.get_rect(topright=[rect.right, y]))
+            y += text.get_height()
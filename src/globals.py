@@ -1,48 +1,37 @@
-import ctypes
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 import pygame
 
-user32 = ctypes.windll.user32
-
-
-# try:
-#     user32 = ctypes.windll.user32
-#     raise AttributeError
-# except AttributeError:
-#     # in a different OS
-#     user32 = type(
-#         'user32',
-#         (),
-#         {'GetSystemMetrics': lambda x: Config.W if x == 0 else Config.W}
-#     )
+from src.utils import SurfaceCache
 
 
 class Config:
     W, H = 1200, 800
     FPS = 60
     TARGET_FPS = 60
+    IDLE_REDRAW = True  # only redraw the editor when something changed
+    IDLE_TIMEOUT = 100  # ms to sleep waiting for an event while idle
+    DIRTY_RECTS = True  # only redraw and push the regions of the screen that changed
+    RENDERER = False  # compose cached textures with an SDL2 Renderer instead of drawing on the display surface
     ASSETS = Path(__file__).parent.parent / 'assets'
     BACKUP_FONT_NAME = ASSETS / 'fonts' / 'font.ttf'
     FONT_NAME = 'consolas'
     FONT_SIZE = 30
     BG_COLOR = '#' + '11' * 3
     DEFAULT_DIALOG_BOX_SIZE = [500, 200]
+    ROCK_CACHE_SIZE = 64
+    GRADIENT_CACHE_BYTES = 8 * 1024 * 1024
+    TEXT_CACHE_BYTES = 4 * 1024 * 1024
+    ROCK_CACHE_DIR = None  # directory for the on-disk tier of the rock cache (disabled if None)
+    SPRITE_SHEET_FRAMES = 36  # angles baked into an exported rotation sprite sheet
+    EXPORT_PHYSICS = True  # include area, centroid, inertia and collision hull in geometry exports
+    EXPORT_WORKERS = 4  # exports running at the same time, the rest wait in a queue
+    EXPORT_STATUS_TIME = 5  # seconds a finished export stays listed in the editor
 
 
 class Globals:
-    # Get the primary monitor
-    SCREEN_WIDTH = user32.GetSystemMetrics(0)  # SM_CXSCREEN
-    SCREEN_HEIGHT = user32.GetSystemMetrics(1)  # SM_CYSCREEN
-    # SCREEN_WIDTH = 0
-    # SCREEN_HEIGHT = 0
-    min_padding = 100
-    if SCREEN_WIDTH <= Config.W + min_padding:
-        Config.W = SCREEN_WIDTH - min_padding
-    if SCREEN_HEIGHT <= Config.H + min_padding:
-        Config.H = SCREEN_HEIGHT - min_padding
-
     ROCK_WIDTH = Config.W * 0.6
     ROCK_HEIGHT = Config.H * 0.65
     ROCK_POINTS = 25
@@ -56,26 +45,78 @@ class Globals:
     LIGHTING = True
 
 
+@lru_cache(maxsize=None)
+def get_screen_size():
+    """
+    Size of the primary monitor, asked from SDL the first time it's needed
+    """
+    if not pygame.display.get_init():
+        pygame.display.init()
+    sizes = pygame.display.get_desktop_sizes()
+    return sizes[0] if sizes else (Config.W, Config.H)
+
+
+def fit_to_screen(min_padding=100):
+    """
+    Shrinks the default window (and the rock with it) to fit smaller screens, before it's opened
+    """
+    width, height = get_screen_size()
+    # headless drivers only report a nominal desktop size
+    if pygame.display.get_driver() in ['dummy', 'offscreen']:
+        return
+    if width <= Config.W + min_padding:
+        Config.W = width - min_padding
+        Globals.ROCK_WIDTH = Config.W * 0.6
+    if height <= Config.H + min_padding:
+        Config.H = height - min_padding
+        Globals.ROCK_HEIGHT = Config.H * 0.65
+
+
 class Events:
     (
         MOUSE_HOVERED,
         MOUSE_GRAB,
+        EXPORT,  # an export started or finished, posted from the export threads
+        ROCK_GENERATED,  # a rock requested with RockApp.request_rock is ready
         *_
     ) = [pygame.event.custom_type() for _ in range(10)]
 
 
 class BaseStructure:
+    __slots__ = ()
+
     def update(self, events: list[pygame.event.Event], dt):
         pass
 
     def draw(self, screen: pygame.Surface):
         pass
 
+    def needs_redraw(self):
+        # whether the next frame changes even without any new input (animations, timers)
+        return False
+
+    def get_dirty_rect(self):
+        # region of the screen touched by draw (None for the whole screen)
+        return None
+
+    def get_draw_state(self):
+        # anything that changes what draw renders inside the dirty rect (None if unknown)
+        return None
+
     @staticmethod
     def post(event, **kwargs):
         pygame.event.post(pygame.event.Event(event, **kwargs))
 
 
+def set_cursor(cursor):
+    # system cursors can't be created by every video driver (e.g. the headless dummy driver)
+    try:
+        if pygame.mouse.get_cursor() != cursor:
+            pygame.mouse.set_cursor(cursor)
+    except pygame.error:
+        pass
+
+
 def chain_function(f):
     # to be used only in methods
     self = None
@@ -90,16 +131,24 @@ def chain_function(f):
 
 
 _font = None
+# rendered text, shared by every caller of get_text (the surfaces must not be modified)
+text_cache = SurfaceCache(Config.TEXT_CACHE_BYTES)
 
 
 def get_text(name, color='black', wraplength=0):
     global _font
+    key = name, color if isinstance(color, str) else tuple(pygame.Color(color)), wraplength
+    text = text_cache.get(key)
+    if text is not None:
+        return text
     if not _font:
         if False and Config.FONT_NAME not in pygame.font.get_fonts():
             _font = pygame.font.Font(Config.BACKUP_FONT_NAME, Config.FONT_SIZE)
         else:
             _font = pygame.font.SysFont(Config.FONT_NAME, Config.FONT_SIZE)
-    return _font.render(name, True, color, wraplength=wraplength)
+    text = _font.render(name, True, color, wraplength=wraplength)
+    text_cache.put(key, text)
+    return text
 
 
 # for closing pyinstaller splash screen if loaded from bundle
@@ -0,0 +1,66 @@
+"""
+Physical properties of a rock's mesh, computed once at export so physics engines only have to read them
+"""
+
+import numpy as np
+
+
+def get_triangle_areas(corners):
+    """
+    Signed areas of triangles given as an (M, 3, 2) array of corners (positive when counterclockwise in a y-up frame)
+    """
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    return ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])) / 2
+
+
+def get_winding_hull(points, hull):
+    """
+    Hull vertex indices ordered counterclockwise in a y-up frame (clockwise on screen)
+    """
+    hull = np.asarray(hull)
+    x, y = points[hull, 0], points[hull, 1]
+    signed_area = (x * np.roll(y, -1) - np.roll(x, -1) * y).sum()
+    return hull if signed_area >= 0 else hull[::-1]
+
+
+def get_physics_properties(points, simplices, hull, density=1.0):
+    """
+    Mass properties of a rock, treating it as a flat solid of uniform density
+
+    :param points: (N, 2) points of the rock, as exported
+    :param simplices: (M, 3) triangles covering the rock
+    :param hull: indices of the convex hull vertices
+    :param density: mass per unit area
+    :return: dict of
+             area, mass,
+             centroid [x, y],
+             inertia: 2x2 inertia tensor about the centroid [[Ixx, Ixy], [Ixy, Iyy]] (Ixy = -mass * mean(x * y)),
+             moment: polar moment of inertia about the centroid (what 2D engines call the moment),
+             hull: hull points in winding order, usable as the collision polygon
+    """
+    points = np.asarray(points, dtype=np.float64)
+    # a single gather of all corners, everything below works on its columns
+    corners = points[np.asarray(simplices)]  # (M, 3, 2)
+    areas = np.abs(get_triangle_areas(corners))
+    area = areas.sum()
+    (x1, y1), (x2, y2), (x3, y3) = corners[:, 0].T, corners[:, 1].T, corners[:, 2].T
+    centroid = np.array([areas @ (x1 + x2 + x3), areas @ (y1 + y2 + y3)]) / (3 * area)
+    # second moments of area of every triangle about the origin
+    xx = areas @ (x1 * x1 + x2 * x2 + x3 * x3 + x1 * x2 + x2 * x3 + x1 * x3) / 6
+    yy = areas @ (y1 * y1 + y2 * y2 + y3 * y3 + y1 * y2 + y2 * y3 + y1 * y3) / 6
+    xy = areas @ (
+        2 * (x1 * y1 + x2 * y2 + x3 * y3) + x1 * y2 + x2 * y1 + x1 * y3 + x3 * y1 + x2 * y3 + x3 * y2
+    ) / 12
+    # moved to the centroid (parallel axis theorem)
+    cx, cy = centroid
+    ixx = density * (yy - area * cy ** 2)
+    iyy = density * (xx - area * cx ** 2)
+    ixy = -density * (xy - area * cx * cy)
+    return {
+        'area': float(area),
+        'mass': float(area * density),
+        'centroid': centroid.tolist(),
+        'inertia': [[float(ixx), float(ixy)], [float(ixy), float(iyy)]],
+        'moment': float(ixx + iyy),
+        'hull': points[get_winding_hull(points, hull)].tolist()
+    }
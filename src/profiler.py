@@ -0,0 +1,213 @@
+"""
+Frame profiler for the editor and dialog loops
+
+Times every phase of a frame and every object's update and draw, shows a frame-time graph
+over the editor (F3) and dumps the recorded frames as a Chrome trace (F4), which can be opened
+in chrome://tracing or https://ui.perfetto.dev. While disabled, a section costs one attribute
+lookup and entering a shared no-op context manager.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+import pygame
+
+from src.globals import BaseStructure, Config
+
+TOGGLE_KEY = pygame.K_F3
+DUMP_KEY = pygame.K_F4
+
+_disabled = nullcontext()
+
+
+def get_label(obj):
+    name = getattr(obj, 'name', None)
+    return f'{type(obj).__name__}({name})' if isinstance(name, str) else type(obj).__name__
+
+
+class Section:
+    __slots__ = ('profiler', 'name', 'category', 'start')
+
+    def __init__(self, profiler, name, category):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profiler.add(self.name, self.category, self.start, time.perf_counter_ns())
+
+
+class ProfiledLayer:
+    """
+    Stands in for a layer while profiling, timing its draw calls
+    """
+    __slots__ = ('layer', 'profiler', 'name')
+
+    def __init__(self, layer, profiler):
+        self.layer = layer
+        self.profiler = profiler
+        self.name = get_label(layer) + '.draw'
+
+    def get_dirty_rect(self):
+        return self.layer.get_dirty_rect()
+
+    def get_draw_state(self):
+        return self.layer.get_draw_state()
+
+    def draw(self, screen: pygame.Surface):
+        with Section(self.profiler, self.name, 'draw'):
+            self.layer.draw(screen)
+
+
+class Profiler:
+    """
+    Records timed sections of the last `history` frames
+    """
+
+    def __init__(self, history=300, max_events=200_000):
+        self.enabled = False
+        self.frame_times = deque(maxlen=history)
+        self.events = deque(maxlen=max_events)
+        self.last_frame = {}
+        self._frame = defaultdict(int)
+        self._frame_start = None
+        self._layers = {}
+        self.overlay = ProfilerOverlay(self)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._frame_start = None
+        self._layers.clear()
+
+    def section(self, name, category='phase'):
+        """
+        Context manager timing a block, `name` is a string or the object being updated / drawn,
+        which is named after its class and the category (Button(Export).update)
+        """
+        if not self.enabled:
+            return _disabled
+        return Section(self, name if isinstance(name, str) else f'{get_label(name)}.{category}', category)
+
+    def add(self, name, category, start, end):
+        self.events.append((name, category, start, end, threading.get_native_id()))
+        self._frame[name] += end - start
+
+    def frame_start(self):
+        if self.enabled:
+            self._frame_start = time.perf_counter_ns()
+
+    def frame_end(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        end = time.perf_counter_ns()
+        self.add('frame', 'frame', self._frame_start, end)
+        self.frame_times.append((end - self._frame_start) / 1e6)
+        self.last_frame = dict(self._frame)
+        self._frame.clear()
+        self._frame_start = None
+
+    def wrap(self, layers):
+        """
+        The layers as drawn by a compositor, with their draw calls timed while profiling
+        """
+        if not self.enabled:
+            return layers
+        # the same stand-in every frame, compositors keep their caches per layer
+        self._layers = {i: self._layers.get(i) or ProfiledLayer(i, self) for i in layers}
+        return list(self._layers.values())
+
+    def handle_events(self, events):
+        for e in events:
+            if e.type == pygame.KEYDOWN:
+                if e.key == TOGGLE_KEY:
+                    self.toggle()
+                elif e.key == DUMP_KEY and self.events:
+                    print(f'profile written to {self.dump()}')
+
+    def get_trace(self):
+        """
+        Recorded sections in the Chrome trace event format
+        """
+        pid = os.getpid()
+        return {
+            'traceEvents': [
+                {'name': name, 'cat': category, 'ph': 'X', 'ts': start / 1000, 'dur': (end - start) / 1000,
+                 'pid': pid, 'tid': tid}
+                for name, category, start, end, tid in self.events
+            ],
+            'displayTimeUnit': 'ms'
+        }
+
+    def dump(self, filename=None):
+        filename = filename or f'profile_{time.strftime("%Y%m%d_%H%M%S")}.json'
+        with open(filename, 'w') as f:
+            json.dump(self.get_trace(), f)
+        return filename
+
+
+class ProfilerOverlay(BaseStructure):
+    """
+    Frame-time graph of the last frames and the slowest sections of the last one
+    """
+
+    def __init__(self, profiler: Profiler, size=(320, 130), font_size=14):
+        self.profiler = profiler
+        self.size = size
+        self.font_size = font_size
+        self._font = None
+
+    @property
+    def rect(self):
+        return pygame.Rect(10, Config.H - self.size[1] - 10, *self.size)
+
+    def needs_redraw(self):
+        # the graph moves every frame
+        return self.profiler.enabled
+
+    def get_dirty_rect(self):
+        return self.rect if self.profiler.enabled else pygame.Rect(0, 0, 0, 0)
+
+    def get_draw_state(self):
+        return None if self.profiler.enabled else False
+
+    def get_lines(self):
+        times = self.profiler.frame_times
+        if not times:
+            return []
+        lines = [f'frame {times[-1]:5.1f} ms  avg {sum(times) / len(times):5.1f}  max {max(times):5.1f}']
+        # the frame itself is the slowest
+        slowest = sorted(self.profiler.last_frame.items(), key=lambda i: -i[1])[1:4]
+        return lines + [f'{name[:32]:<32} {t / 1e6:5.2f}' for name, t in slowest]
+
+    def draw(self, screen: pygame.Surface):
+        if not self.profiler.enabled:
+            return
+        if self._font is None:
+            # a small font of its own, the changing numbers would only fill the text cache
+            self._font = pygame.font.SysFont(Config.FONT_NAME, self.font_size)
+        rect = self.rect
+        pygame.draw.rect(screen, 'black', rect)
+        pygame.draw.rect(screen, 'white', rect, 1)
+        budget = 1000 / Config.TARGET_FPS
+        graph = pygame.Rect(rect.x + 2, rect.y + 4 * self.font_size + 6, rect.w - 4, 0)
+        graph.h = rect.bottom - 2 - graph.y
+        scale = graph.h / (2 * budget)  # the graph is two frame budgets high
+        pygame.draw.line(screen, 'gray', (graph.x, graph.bottom - budget * scale),
+                         (graph.right, graph.bottom - budget * scale))
+        times = list(self.profiler.frame_times)[-graph.w:]
+        if len(times) > 1:
+            points = [(graph.x + x, graph.bottom - min(t, 2 * budget) * scale) for x, t in enumerate(times)]
+            pygame.draw.lines(screen, 'green' if max(times) <= budget else 'red', False, points)
+        for i, line in enumerate(self.get_lines()):
+            screen.blit(self._font.render(line, True, 'white'), (rect.x + 5, rect.y + 3 + i * self.font_size))
+
+
+profiler = Profiler()
@@ -1,13 +1,12 @@
+import math
 import random
+from functools import lru_cache
 
+import numpy as np
 import pygame
 
-try:
-    from scipy.spatial import ConvexHull, Delaunay
-except (ModuleNotFoundError, ImportError):
-    pass
-
-from src.globals import BaseStructure, Globals
+from src.globals import BaseStructure, Config, Globals
+from src.rock_cache import RockCache
 
 import pygame.gfxdraw
 
@@ -16,35 +15,183 @@ class Point(pygame.Vector2):
     pass
 
 
+rock_cache = RockCache(Config.ROCK_CACHE_SIZE, Config.ROCK_CACHE_DIR)
+
+# one point on each side of the bounding box plus at least one inside
+MIN_POINTS = 5
+
+
+def get_rotation(angle):
+    """
+    (cos, sin) of `angle` degrees, as pygame.Vector2.rotate computes them
+    """
+    # (1, 0) rotated is (cos, sin), with pygame's own reduction of the angle and exact right angles
+    return tuple(pygame.Vector2(1, 0).rotate(angle))
+
+
+def rotate_points(points, angle):
+    """
+    Rotates an (N, 2) array of points by `angle` degrees
+    (vectorized equivalent of pygame.Vector2.rotate, including its exact right-angle cases)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    x, y = points[:, 0], points[:, 1]
+    cos, sin = get_rotation(angle)
+    return np.stack([cos * x - sin * y, sin * x + cos * y], axis=1)
+
+
+def rotate_points_batch(points, angles):
+    """
+    Rotates an (N, 2) array of points by each of the K `angles` at once
+
+    :return: (K, N, 2) array, the same points as rotate_points for every angle
+    """
+    points = np.asarray(points, dtype=np.float64)
+    cos, sin = np.array([get_rotation(i) for i in angles], dtype=np.float64).T[..., None]
+    x, y = points[:, 0], points[:, 1]
+    return np.stack([cos * x - sin * y, sin * x + cos * y], axis=2)
+
+
+@lru_cache(maxsize=360)
+def get_rotated_size(width, height, angle):
+    """
+    Size of a `width` x `height` surface after pygame.transform.rotate by `angle`,
+    computed the same way pygame does but without allocating or rotating any surface
+    """
+    width, height = int(width), int(height)
+    angle = float(np.float32(angle))  # transform.rotate takes a C float
+    if width < 1 or height < 1:
+        return width, height
+    if not math.fmod(angle, 90):
+        return (height, width) if int(angle) // 90 % 2 else (width, height)
+    radians = angle * .01745329251994329
+    sin, cos = math.sin(radians), math.cos(radians)
+    cx, cy, sx, sy = cos * width, cos * height, sin * width, sin * height
+    return (
+        int(max(abs(cx + sy), abs(cx - sy), abs(-cx + sy), abs(-cx - sy))),
+        int(max(abs(sx + cy), abs(sx - cy), abs(-sx + cy), abs(-sx - cy)))
+    )
+
+
+@lru_cache(maxsize=64)
+def _get_base_color(color):
+    return np.array(pygame.Color(color)[:3], dtype=np.float64)
+
+
+def get_base_color(color):
+    """
+    The base rock color parsed into a float (r, g, b) array, cached per color
+    """
+    return _get_base_color(color if isinstance(color, str) else tuple(pygame.Color(color)))
+
+
+def get_shades(points, simplices, light, color):
+    """
+    Computes the lit color of every triangle at once
+
+    :param points: (N, 2) array of rotated and translated vertices (or (K, N, 2) for K frames)
+    :param simplices: (M, 3) index table of triangles
+    :param light: position of the light source (or (K, 1, 2) positions, one per frame)
+    :param color: base color of the rock
+    :return: (M, 3) integer array of rgb colors (or (K, M, 3))
+    """
+    distances = np.sqrt(((points - np.asarray(light, dtype=np.float64)) ** 2).sum(axis=-1))
+    k = np.clip(255 - distances[..., simplices].min(axis=-1) / 4, 0, 255) / 255
+    return (get_base_color(color) * k[..., None]).astype(np.int64)
+
+
 class Rock(BaseStructure):
-    def __init__(self, width, height, num_points, position=None, scale=1.0):
-        self.points = self.generate_rock_points(width, height, num_points)
-        self.tri = Delaunay(self.points)
-        self.outer_points = self.generate_outer_body(self.points)
+    # geometry is kept in contiguous arrays, Vector2s are only created when handing points to pygame
+    __slots__ = (
+        'seed', 'points', 'simplices', 'hull', 'angle', 'pos', 'rel_dimensions', 'scale', 'size',
+        'render_key', 'render_surface', 'render_topleft', 'render_fresh', 'render_hits', 'render_misses'
+    )
+
+    def __init__(self, width, height, num_points, position=None, scale=1.0, seed=None, geometry=None):
+        if seed is None and geometry is None:
+            seed = random.randrange(2 ** 32)
+        # the exports store seeds as uint32, masked before generating so the stored seed gives the same rock
+        # (None for imported geometry whose seed isn't known)
+        self.seed = None if seed is None else seed & 0xFFFFFFFF
+        # (N, 2) float32 points, (M, 3) int32 simplices and int32 hull vertex indices
+        if geometry is None:
+            geometry = self.generate_geometry(width, height, num_points, self.seed)
+        self.points, self.simplices, self.hull = geometry
         self.angle = 0
         self.pos = Point(0, 0) if position is None else position
         self.rel_dimensions = [0, 0]
         self.scale = scale
         self.size = [width, height]
+        # cache of the last rasterized rock, reused as long as its render key doesn't change
+        self.render_key = None
+        self.render_surface = None
+        self.render_topleft = (0, 0)
+        # rasterized since the last draw, which then isn't a cache hit
+        self.render_fresh = False
+        self.render_hits = 0
+        self.render_misses = 0
 
-    @staticmethod
-    def generate_rock_points(width, height, num_points):
-        random.seed()
-        points = [Point(random.randint(-width // 2, width // 2), random.randint(-height // 2, height // 2)) for _ in
-                  range(num_points - 4)]
-        points.append(points[0])
-        points.append(Point(random.randint(-width // 2, width // 2), -height // 2))
-        points.append(Point(random.randint(-width // 2, width // 2), height // 2))
-        points.append(Point(-width // 2, random.randint(-height // 2, height // 2)))
-        points.append(Point(width // 2, random.randint(-height // 2, height // 2)))
-        return points
+    @property
+    def outer_points(self):
+        return self.points[self.hull]
+
+    @classmethod
+    def from_geometry(cls, points, simplices, hull, size, angle=0, seed=None, position=None):
+        """
+        Rebuilds an exported rock from its stored points and triangles, without triangulating it again
+
+        :param points: (N, 2) points, rotated by `angle` like the exports store them
+        :param simplices: (M, 3) indices of the triangles
+        :param hull: indices of the convex hull vertices, in winding order
+        :param size: width and height the rock was generated with
+        :param seed: seed the rock was generated from, None if it isn't known
+        """
+        geometry = (
+            rotate_points(points, -angle).astype(np.float32),
+            np.array(simplices, dtype=np.int32),
+            np.array(hull, dtype=np.int32)
+        )
+        width, height = size
+        rock = cls(width, height, len(geometry[0]) - 1, position, seed=seed, geometry=geometry)
+        rock.angle = angle
+        return rock
+
+    @classmethod
+    def generate_geometry(cls, width, height, num_points, seed):
+        """
+        Points, Delaunay simplices and convex hull vertices of a rock,
+        taken from the rock cache when this rock has been generated before
+        """
+        key = rock_cache.get_key(width, height, num_points, seed)
+        geometry = rock_cache.get(key)
+        if geometry is None:
+            # SciPy is most of the editor's startup time, it's only loaded once a rock has to be triangulated
+            from scipy.spatial import ConvexHull, Delaunay
+
+            points = cls.generate_rock_points(width, height, num_points, seed)
+            geometry = points, Delaunay(points).simplices, ConvexHull(points).vertices
+            rock_cache.put(key, geometry)
+        points, simplices, hull = geometry
+        return points.astype(np.float32, copy=False), simplices.astype(np.int32, copy=False), \
+            hull.astype(np.int32, copy=False)
 
     @staticmethod
-    def generate_outer_body(points):
-        hull = ConvexHull(points)
-        hull_vertices = hull.vertices
-        convex_hull_points = [points[i] for i in hull_vertices]
-        return convex_hull_points
+    def generate_rock_points(width, height, num_points, seed=None):
+        if num_points < MIN_POINTS:
+            raise ValueError(f'a rock needs at least {MIN_POINTS} points, got {num_points}')
+        rng = random.Random(seed)
+        x_range = -width // 2, width // 2
+        y_range = -height // 2, height // 2
+        # the first point is repeated, which gives num_points + 1 points in total
+        points = np.empty([num_points + 1, 2], dtype=np.float32)
+        for i in range(num_points - 4):
+            points[i] = rng.randint(*x_range), rng.randint(*y_range)
+        points[-5] = points[0]
+        points[-4] = rng.randint(*x_range), y_range[0]
+        points[-3] = rng.randint(*x_range), y_range[1]
+        points[-2] = x_range[0], rng.randint(*y_range)
+        points[-1] = x_range[1], rng.randint(*y_range)
+        return points
 
     @staticmethod
     def get_random_range(x, y=None):
@@ -53,24 +200,126 @@ class Rock(BaseStructure):
             x = -x
         return random.randint(x, y)
 
-    def draw(self, screen: pygame.Surface):
+    def invalidate(self):
+        self.render_key = None
+
+    def get_render_key(self):
+        """
+        Everything the rasterized rock depends on, relative to its whole-pixel position
+        (so moving the rock and the light together still reuses the cache)
+        """
+        x, y = self.pos
+        ix, iy = math.floor(x), math.floor(y)
         if not Globals.LIGHTING:
-            points = [Point(i).rotate(self.angle) + self.pos for i in self.outer_points]
-            pygame.draw.polygon(screen, 'black', points)
-            return
-        points = [i.rotate(self.angle) + self.pos for i in self.points]
-        s = pygame.Surface([Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT])
-        s = pygame.transform.rotate(s, self.angle)
-        self.rel_dimensions = [*s.get_rect().size]
-        mouse_pos = Point(*Globals.LIGHT_COORD)
-        for simplex in self.tri.simplices:
-            d = [points[i].distance_to(mouse_pos) for i in simplex]
-            k = 255 - min(d) / 4
-            k = pygame.math.clamp(k, 0, 255)
-            k = k / 255
-            color = pygame.Color(Globals.ROCK_COLOR)
-            r = int(color.r * k)
-            g = int(color.g * k)
-            b = int(color.b * k)
-            color.update(r, g, b)
-            pygame.draw.polygon(screen, color, [points[i] for i in simplex])
+            return self.angle, False, x - ix, y - iy
+        lx, ly = Globals.LIGHT_COORD
+        color = Globals.ROCK_COLOR
+        color = color if isinstance(color, str) else tuple(pygame.Color(color))
+        return self.angle, True, x - ix, y - iy, lx - ix, ly - iy, color
+
+    def get_raster_geometry(self, key, scale=1.0):
+        """
+        Polygons of the rock in the pixel coordinates of its tightly fitting surface
+
+        :param key: render key, see get_render_key
+        :param scale: scale of the drawn rock (lighting is computed at the original size)
+        :return: (N, 2) points, (M, k) polygon index table, (M, 3) polygon colors,
+                 the offset of the surface's topleft from the rock's whole-pixel position and its size
+        """
+        angle, lighting, fx, fy, *light = key
+        if lighting:
+            lx, ly, color = light
+            points = rotate_points(self.points, angle) + [fx, fy]
+            polygons = self.simplices
+            colors = get_shades(points, polygons, [lx, ly], color)
+        else:
+            points = rotate_points(self.outer_points, angle) + [fx, fy]
+            polygons = np.arange(len(points))[None]
+            colors = np.zeros([1, 3], dtype=np.int64)  # black
+        if scale != 1:
+            points *= scale
+        topleft = np.floor(points.min(axis=0))
+        size = np.ceil(points.max(axis=0)) - topleft + 1
+        points -= topleft
+        return points, polygons, colors, topleft.astype(int).tolist(), size.astype(int).tolist()
+
+    def rasterize(self, key, scale=1.0):
+        """
+        Draws the rock onto a tightly fitting transparent surface
+
+        :param key: render key, see get_render_key
+        :param scale: scale of the drawn rock (lighting is computed at the original size)
+        :return: the surface and the offset of its topleft from the rock's whole-pixel position
+        """
+        points, polygons, colors, topleft, size = self.get_raster_geometry(key, scale)
+        surf = pygame.Surface(size, pygame.SRCALPHA)
+        for polygon, color in zip(points[polygons].tolist(), colors.tolist()):
+            pygame.draw.polygon(surf, color, polygon)
+        return surf, topleft
+
+    def get_export_key(self, light=None, color=None, lighting=None):
+        """
+        Render key of the rock drawn around its own center, as used by the exports
+
+        :param light: light position relative to the rock's center (defaults to the editor's light)
+        :param color: base color of the rock (defaults to Globals.ROCK_COLOR)
+        :param lighting: whether the rock is lit (defaults to Globals.LIGHTING)
+        """
+        lighting = Globals.LIGHTING if lighting is None else lighting
+        if not lighting:
+            return self.angle, False, 0, 0
+        if light is None:
+            x, y = self.pos
+            light = Globals.LIGHT_COORD[0] - x, Globals.LIGHT_COORD[1] - y
+        color = Globals.ROCK_COLOR if color is None else color
+        color = color if isinstance(color, str) else tuple(pygame.Color(color))
+        return self.angle, True, 0, 0, *light, color
+
+    def render(self, scale=1.0, light=None, color=None, lighting=None):
+        """
+        Renders the rock onto its own SRCALPHA surface, without needing a display
+        (see get_export_key for the other parameters)
+
+        :param scale: scale of the rendered rock
+        :return: the surface and the offset of its topleft from the rock's center
+        """
+        key = self.get_export_key(light, color, lighting)
+        if scale == 1 and key == self.render_key:
+            return self.render_surface, self.render_topleft
+        return self.rasterize(key, scale)
+
+    def update_render(self):
+        """
+        Rasterizes the rock again if its render key changed, returns whether it did
+        """
+        key = self.get_render_key()
+        if key == self.render_key:
+            return False
+        self.render_surface, self.render_topleft = self.rasterize(key)
+        self.render_key = key
+        self.render_misses += 1
+        self.render_fresh = True
+        return True
+
+    def get_dirty_rect(self):
+        self.update_render()
+        x, y = self.pos
+        dx, dy = self.render_topleft
+        return pygame.Rect(math.floor(x) + dx, math.floor(y) + dy, *self.render_surface.get_size())
+
+    def get_draw_state(self):
+        self.update_render()
+        return self.render_key
+
+    def update(self, events: list[pygame.event.Event], dt):
+        if Globals.LIGHTING:
+            self.rel_dimensions = [*get_rotated_size(Globals.ROCK_WIDTH, Globals.ROCK_HEIGHT, self.angle)]
+
+    def draw(self, screen: pygame.Surface):
+        # the compositor already updated the render through get_dirty_rect / get_draw_state
+        self.update_render()
+        if self.render_fresh:
+            self.render_fresh = False
+        else:
+            self.render_hits += 1
+        screen.blit(self.render_surface, self.get_dirty_rect())
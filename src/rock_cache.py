@@ -0,0 +1,66 @@
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+class RockCache:
+    """
+    LRU cache of generated rock geometry (points, Delaunay simplices and hull vertices),
+    keyed by (width, height, num_points, seed), with an optional on-disk tier
+    """
+
+    def __init__(self, maxsize=64, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(width, height, num_points, seed):
+        return float(width), float(height), int(num_points), int(seed)
+
+    def get_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return Path(self.directory) / f'{digest}.npz'
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        if self.directory is not None and (path := self.get_path(key)).exists():
+            with np.load(path) as data:
+                geometry = data['points'], data['simplices'], data['hull']
+            self._store(key, geometry)
+            self.disk_hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, geometry):
+        self._store(key, geometry)
+        if self.directory is not None:
+            path = self.get_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            points, simplices, hull = geometry
+            # write then rename, so other processes sharing the directory never read a partial file
+            tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp.npz')
+            np.savez(tmp, points=points, simplices=simplices, hull=hull)
+            os.replace(tmp, path)
+
+    def _store(self, key, geometry):
+        for i in geometry:
+            # entries are shared between rocks
+            i.setflags(write=False)
+        self._entries[key] = geometry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,286 @@
+"""
+Binary geometry formats next to the JSON export, and loading any of them back into a Rock
+
+Single rocks are written as uncompressed .npz archives with the arrays
+
+    points      (N, 2) float32, rotated by angle (the same points as the JSON export)
+    simplices   (M, 3) int32 indices into points
+    hull        (H,) int32 indices of the convex hull vertices
+    size        (2,) float32 width and height the rock was generated with
+    angle       () float32 rotation in degrees
+    seed        () uint32 seed the rock was generated from, left out when it isn't known
+
+and, when exported with physics=True, the properties of src.physics.get_physics_properties
+(area, mass, centroid, inertia, moment and the winding-order hull as hull_points).
+
+Many rocks are packed into one batch file (.rocks), all little-endian:
+
+    header      8s magic b'PYROCKS1', I version, I count, Q index offset
+    records     per rock: points (float32), simplices (int32) and hull (int32), back to back
+    index       count entries of Q record offset, I N, I M, I H, f width, f height, f angle, I seed, I flags
+
+where flags has SEED_UNKNOWN set for rocks without a seed (imported ones), their seed is written as 0.
+
+Records start at multiples of 8 bytes and the index is written last, so rocks can be appended
+while writing and any single rock can be memory-mapped and read without parsing the rest.
+"""
+
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from src.physics import get_physics_properties
+from src.rock import Rock, rotate_points
+
+MAGIC = b'PYROCKS1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQ')
+INDEX_ENTRY = struct.Struct('<QIIIfffII')
+SEED_UNKNOWN = 1
+
+
+def get_export_data(rock):
+    """
+    Geometry of a rock as it is exported, see the module docstring
+    """
+    data = {
+        'points': rotate_points(rock.points, rock.angle).astype(np.float32),
+        'simplices': rock.simplices.astype(np.int32, copy=False),
+        'hull': rock.hull.astype(np.int32, copy=False),
+        'size': np.array(rock.size, dtype=np.float32),
+        'angle': np.float32(rock.angle)
+    }
+    if rock.seed is not None:
+        data['seed'] = np.uint32(rock.seed)
+    return data
+
+
+def save_npz(filename, rock, physics=False):
+    data = get_export_data(rock)
+    if physics:
+        properties = get_physics_properties(data['points'], data['simplices'], data['hull'])
+        properties['hull_points'] = properties.pop('hull')
+        data.update({i: np.asarray(j, dtype=np.float64) for i, j in properties.items()})
+    np.savez(filename, **data)
+
+
+def load_npz(filename):
+    with np.load(filename) as data:
+        return {i: data[i] for i in data.files}
+
+
+class BatchWriter:
+    """
+    Writes rocks into a batch file one by one, the index is written when the writer is closed
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'wb')
+        self.index = []
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    def add(self, rock):
+        self.add_data(get_export_data(rock))
+
+    def add_data(self, data):
+        offset = self.file.tell()
+        points, simplices, hull = data['points'], data['simplices'], data['hull']
+        for array, dtype in [(points, '<f4'), (simplices, '<i4'), (hull, '<i4')]:
+            self.file.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        self.file.write(bytes(-self.file.tell() % 8))
+        width, height = data['size']
+        seed = data.get('seed')
+        self.index.append(INDEX_ENTRY.pack(
+            offset, len(points), len(simplices), len(hull), width, height, data['angle'],
+            0 if seed is None else seed, SEED_UNKNOWN if seed is None else 0
+        ))
+
+    def close(self):
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(b''.join(self.index))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(self.index), index_offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class BatchReader:
+    """
+    Memory-mapped batch file, reading a rock only touches that rock's index entry and arrays
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f'{filename} is too short for a rock batch file')
+        magic, version, self.count, self.index_offset = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{filename} is not a rock batch file')
+        if version != VERSION:
+            raise ValueError(f'unsupported rock batch file version {version}')
+        if not HEADER.size <= self.index_offset <= len(self._mmap) - self.count * INDEX_ENTRY.size:
+            raise ValueError(f'{filename} is truncated or corrupt, its index is outside the file')
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """
+        Geometry of the i-th rock (see get_export_data), the arrays are read-only views of the file
+        """
+        if not -self.count <= i < self.count:
+            raise IndexError('rock index out of range')
+        i %= self.count
+        offset, n, m, h, width, height, angle, seed, flags = INDEX_ENTRY.unpack_from(
+            self._mmap, self.index_offset + i * INDEX_ENTRY.size
+        )
+        if not HEADER.size <= offset <= self.index_offset - (n * 2 + m * 3 + h) * 4:
+            raise ValueError(f'rock {i} of the batch file is truncated or corrupt, it lies outside the records')
+        points = np.frombuffer(self._mmap, '<f4', n * 2, offset).reshape(n, 2)
+        offset += points.nbytes
+        simplices = np.frombuffer(self._mmap, '<i4', m * 3, offset).reshape(m, 3)
+        offset += simplices.nbytes
+        hull = np.frombuffer(self._mmap, '<i4', h, offset)
+        data = {
+            'points': points,
+            'simplices': simplices,
+            'hull': hull,
+            'size': np.array([width, height], dtype=np.float32),
+            'angle': np.float32(angle)
+        }
+        if not flags & SEED_UNKNOWN:
+            data['seed'] = np.uint32(seed)
+        return data
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    def close(self):
+        # views of the map handed out by __getitem__ keep it alive until they are released
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_json(filename):
+    with open(filename) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f'{filename} does not contain a rock')
+    try:
+        return {
+            'points': np.array(data['points'], dtype=np.float64),
+            'simplices': np.array(data['simplices']),
+            'size': np.array(data['size'], dtype=np.float64),
+            'angle': data['angle'],
+            'seed': data.get('seed')
+        }
+    except TypeError as e:
+        raise ValueError(f'{filename} has values of the wrong type: {e}') from e
+
+
+def is_number(value, kind=np.number):
+    """
+    Whether value is a single number (a scalar or 0-d array) of the given NumPy kind, bools excluded
+    """
+    value = np.asarray(value)
+    return value.shape == () and np.issubdtype(value.dtype, kind)
+
+
+def validate_geometry(data):
+    """
+    Checks the shapes, types and index ranges of loaded geometry, raises ValueError if anything is off
+    """
+    points, simplices = np.asarray(data['points']), np.asarray(data['simplices'])
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+        raise ValueError(f'points must be an (N, 2) array of at least 3 points, got shape {points.shape}')
+    if not np.issubdtype(points.dtype, np.floating) and not np.issubdtype(points.dtype, np.integer):
+        raise ValueError(f'points must be numbers, got {points.dtype}')
+    if not np.isfinite(points).all():
+        raise ValueError('points must be finite')
+    if simplices.ndim != 2 or simplices.shape[1] != 3 or not len(simplices):
+        raise ValueError(f'simplices must be a non-empty (M, 3) array, got shape {simplices.shape}')
+    if not np.issubdtype(simplices.dtype, np.integer):
+        raise ValueError(f'simplices must be integer indices, got {simplices.dtype}')
+    if simplices.min() < 0 or simplices.max() >= len(points):
+        raise ValueError('simplices reference points that do not exist')
+    if ((simplices[:, 0] == simplices[:, 1]) | (simplices[:, 1] == simplices[:, 2]) |
+            (simplices[:, 0] == simplices[:, 2])).any():
+        raise ValueError('simplices contain degenerate triangles')
+    if 'hull' in data:
+        hull = np.asarray(data['hull'])
+        if hull.ndim != 1 or len(hull) < 3 or not np.issubdtype(hull.dtype, np.integer):
+            raise ValueError('hull must be an array of at least 3 point indices')
+        if hull.min() < 0 or hull.max() >= len(points):
+            raise ValueError('hull references points that do not exist')
+    size = np.asarray(data['size'])
+    if size.shape != (2,) or not np.issubdtype(size.dtype, np.number) or not (size > 0).all():
+        raise ValueError(f'size must be a positive width and height, got {size.tolist()}')
+    if not is_number(data['angle']) or not np.isfinite(data['angle']):
+        raise ValueError(f'angle must be a finite number, got {data["angle"]!r}')
+    if data.get('seed') is not None and not is_number(data['seed'], np.integer):
+        raise ValueError(f'seed must be an integer, got {data["seed"]!r}')
+
+
+def load_geometry(filename, index=0):
+    """
+    Reads exported geometry from a .json, .npz or batch (.rocks) file
+
+    :param index: which rock to read from a batch file, only that rock is read from disk
+    :return: dict of points, simplices, size, angle and (if stored) seed and hull, validated
+    """
+    suffix = Path(filename).suffix.lower()
+    if suffix == '.json':
+        data = load_json(filename)
+    elif suffix == '.npz':
+        data = load_npz(filename)
+    elif suffix == '.rocks':
+        with BatchReader(filename) as reader:
+            if not len(reader):
+                raise ValueError(f'{filename} contains no rocks')
+            # copied, so the map can be closed
+            data = {i: np.array(j) for i, j in reader[index].items()}
+    else:
+        raise ValueError(f'unknown rock file format: {suffix}')
+    validate_geometry(data)
+    return data
+
+
+def load_rock(filename, index=0, position=None):
+    """
+    Rebuilds a Rock from an exported file, using the stored triangles instead of triangulating again
+    """
+    data = load_geometry(filename, index)
+    hull = data.get('hull')
+    if hull is None:
+        # the JSON export doesn't store the hull, it's cheap to find again compared to the triangulation
+        from scipy.spatial import ConvexHull, QhullError
+
+        try:
+            hull = ConvexHull(data['points']).vertices
+        except QhullError as e:
+            # degenerate (e.g. collinear) points, reported like the other invalid geometry
+            raise ValueError(f'the points have no convex hull: {str(e).splitlines()[0]}') from e
+    seed = data.get('seed')
+    return Rock.from_geometry(
+        data['points'], data['simplices'], hull, data['size'].tolist(), float(data['angle']),
+        None if seed is None else int(seed), position
+    )
@@ -0,0 +1,99 @@
+"""
+Offline baking of rotating rocks into sprite sheets
+
+Every frame is the rock relit at its own angle (instead of a rotated image with the lighting baked in),
+and the frames are laid out in the rows x cols grid read by src.utils.SpriteSheet / LoopingSpriteSheet.
+"""
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+from src.globals import Globals
+from src.rock import get_shades, rotate_points_batch
+
+
+def get_grid(frames):
+    """
+    Rows and columns of the most square grid holding `frames` frames
+    """
+    cols = math.ceil(math.sqrt(frames))
+    return math.ceil(frames / cols), cols
+
+
+def get_angles(frames, start=0):
+    return [start + i * 360 / frames for i in range(frames)]
+
+
+def bake_rotation_sheet(rock, frames, scale=1.0, light=None, color=None, lighting=True, start=0):
+    """
+    Renders a rock at `frames` evenly spaced angles into one sprite sheet
+
+    The rotations and the lighting of all frames are computed in one batch, every frame is centered
+    on the rock's center in a cell big enough for any of the angles.
+
+    :param rock: the rock to bake
+    :param frames: number of angles over a full turn
+    :param scale: scale of the rendered rock
+    :param light: light position relative to the rock's center, or one position per frame
+                  (defaults to the editor's light)
+    :param color: base color of the rock (defaults to Globals.ROCK_COLOR)
+    :param lighting: whether the rock is lit
+    :param start: angle of the first frame in degrees
+    :return: the sheet, its number of rows and columns, and the size of one frame
+    """
+    angles = get_angles(frames, start)
+    if lighting:
+        if light is None:
+            x, y = rock.pos
+            light = Globals.LIGHT_COORD[0] - x, Globals.LIGHT_COORD[1] - y
+        light = np.broadcast_to(np.asarray(light, dtype=np.float64), (frames, 2))[:, None]
+        color = Globals.ROCK_COLOR if color is None else color
+        points = rotate_points_batch(rock.points, angles)
+        polygons = rock.simplices
+        colors = get_shades(points, polygons, light, color)
+    else:
+        points = rotate_points_batch(rock.outer_points, angles)
+        polygons = np.arange(points.shape[1])[None]
+        colors = np.zeros([frames, 1, 3], dtype=np.int64)  # black
+    if scale != 1:
+        points *= scale
+    # half the cell, the rock's center ends up on a whole pixel in the middle of every frame
+    half = np.ceil(np.abs(points).max(axis=(0, 1)))
+    points += half
+    frame_size = (2 * half + 1).astype(int).tolist()
+    rows, cols = get_grid(frames)
+    w, h = frame_size
+    sheet = pygame.Surface([cols * w, rows * h], pygame.SRCALPHA)
+    for i in range(frames):
+        frame = sheet.subsurface([i % cols * w, i // cols * h, w, h])
+        for polygon, polygon_color in zip(points[i][polygons].tolist(), colors[i].tolist()):
+            pygame.draw.polygon(frame, polygon_color, polygon)
+    return sheet, rows, cols, frame_size
+
+
+def save_rotation_sheet(rock, filename, frames, **kwargs):
+    """
+    Bakes a sprite sheet (see bake_rotation_sheet) into a PNG, with a JSON manifest next to it
+    (rock.png gets rock.sheet.json, so it doesn't overwrite a rock.json geometry export)
+
+    The manifest holds the rows, cols and images arguments for SpriteSheet / LoopingSpriteSheet,
+    the frame size and the angle of every frame.
+    """
+    filename = Path(filename)
+    sheet, rows, cols, frame_size = bake_rotation_sheet(rock, frames, **kwargs)
+    pygame.image.save(sheet, filename, 'png')
+    manifest = {
+        'sheet': filename.name,
+        'rows': rows,
+        'cols': cols,
+        'images': frames,
+        'frame_size': frame_size,
+        'angles': get_angles(frames, kwargs.get('start', 0))
+    }
+    with open(filename.with_name(filename.stem + '.sheet.json'), 'w') as f:
+        f.write(json.dumps(manifest, indent=2))
+    return manifest
@@ -0,0 +1,175 @@
+"""
+Tiled, streaming PNG export for renders too large to hold in memory at once
+
+The image is rasterized one band of tiles at a time. Every tile only draws the triangles whose
+bounding box overlaps it, and finished bands are compressed straight into the PNG file, so peak
+memory is bounded by the tile size (times the image width) instead of the whole image.
+"""
+
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pygame
+
+TILE_SIZE = 512
+
+_geometry = None
+
+
+class PNGWriter:
+    """
+    Writes an 8-bit RGBA PNG band by band, never holding more than the band being written
+    """
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+    def __init__(self, file, width, height, level=6):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._compressor = zlib.compressobj(level)
+        # rows are written with the "up" filter, which needs the last row of the previous band
+        self._previous = np.zeros([width * 4], dtype=np.uint8)
+        self.file.write(self.SIGNATURE)
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def write_chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write_rows(self, rows: np.ndarray):
+        """
+        :param rows: (h, width, 4) uint8 array of the next rows of the image
+        """
+        rows = rows.reshape(len(rows), -1)
+        filtered = np.empty([len(rows), rows.shape[1] + 1], dtype=np.uint8)
+        filtered[:, 0] = 2  # up
+        np.subtract(rows, np.vstack([self._previous, rows[:-1]]), out=filtered[:, 1:])
+        self._previous = rows[-1].copy()
+        self.rows += len(rows)
+        if data := self._compressor.compress(filtered.tobytes()):
+            self.write_chunk(b'IDAT', data)
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f'{self.rows} rows were written, expected {self.height}')
+        self.write_chunk(b'IDAT', self._compressor.flush())
+        self.write_chunk(b'IEND', b'')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+def get_bounding_boxes(points, polygons):
+    """
+    (M, 4) array of the [min x, min y, max x, max y] pixel bounding box of every polygon
+    """
+    corners = points[polygons]
+    return np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+
+
+def draw_tile(geometry, task):
+    """
+    Draws the polygons overlapping one tile
+
+    :param geometry: integer points, polygon index table, polygon colors and bounding boxes
+    :param task: rect of the tile and the indices of the polygons overlapping its band
+    :return: RGBA bytes of the tile
+    """
+    points, polygons, colors, boxes = geometry
+    (x, y, w, h), indices = task
+    indices = indices[(boxes[indices, 0] < x + w) & (boxes[indices, 2] >= x)]
+    surf = pygame.Surface([w, h], pygame.SRCALPHA)
+    # integer coordinates, so the offset doesn't change how pygame truncates them
+    for polygon, color in zip((points[polygons[indices]] - [x, y]).tolist(), colors[indices].tolist()):
+        pygame.draw.polygon(surf, color, polygon)
+    return pygame.image.tobytes(surf, 'RGBA')
+
+
+def _init_worker(geometry):
+    global _geometry
+    _geometry = geometry
+
+
+def _draw_tile(task):
+    return draw_tile(_geometry, task)
+
+
+def iter_bands(geometry, width, height, tile_size, executor=None):
+    """
+    Rasterizes the image band by band, the next band is already being drawn while one is consumed
+
+    :return: generator of (h, width, 4) uint8 arrays
+    """
+    boxes = geometry[3]
+    draw = partial(draw_tile, geometry) if not isinstance(executor, ProcessPoolExecutor) else _draw_tile
+
+    def get_tasks(y):
+        h = min(tile_size, height - y)
+        indices = np.flatnonzero((boxes[:, 1] < y + h) & (boxes[:, 3] >= y))
+        return [((x, y, min(tile_size, width - x), h), indices) for x in range(0, width, tile_size)]
+
+    def assemble(tasks, tiles):
+        return np.concatenate([
+            np.frombuffer(tile, dtype=np.uint8).reshape(rect[3], rect[2], 4) for (rect, _), tile in zip(tasks, tiles)
+        ], axis=1)
+
+    if executor is None:
+        for y in range(0, height, tile_size):
+            tasks = get_tasks(y)
+            yield assemble(tasks, map(draw, tasks))
+        return
+    pending = deque()
+    for y in range(0, height, tile_size):
+        tasks = get_tasks(y)
+        pending.append((tasks, [executor.submit(draw, i) for i in tasks]))
+        if len(pending) > 1:
+            tasks, futures = pending.popleft()
+            yield assemble(tasks, [i.result() for i in futures])
+    while pending:
+        tasks, futures = pending.popleft()
+        yield assemble(tasks, [i.result() for i in futures])
+
+
+def export_png_tiled(rock, filename, scale=1.0, tile_size=TILE_SIZE, workers=0, processes=False, key=None):
+    """
+    Renders a rock straight into a PNG file, tile by tile (same pixels as Rock.render)
+
+    :param rock: the rock to export
+    :param filename: path of the PNG file
+    :param scale: scale of the rendered rock
+    :param tile_size: width and height of the tiles in pixels
+    :param workers: number of threads (or processes) drawing tiles, 0 draws them on the calling thread
+    :param processes: draw the tiles in worker processes instead of threads
+    :param key: render key, defaults to the editor's current lighting (see Rock.get_export_key)
+    :return: size of the exported image
+    """
+    key = rock.get_export_key() if key is None else key
+    points, polygons, colors, _, (width, height) = rock.get_raster_geometry(key, scale)
+    # the points are never negative here, flooring them is what pygame's truncation would do
+    points = np.floor(points).astype(np.int64)
+    geometry = points, polygons, colors, get_bounding_boxes(points, polygons)
+    executor = None
+    if workers and processes:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(geometry,))
+    elif workers:
+        executor = ThreadPoolExecutor(workers)
+    try:
+        with open(filename, 'wb') as f, PNGWriter(f, width, height) as writer:
+            for band in iter_bands(geometry, width, height, tile_size, executor):
+                writer.write_rows(band)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return width, height
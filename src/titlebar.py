@@ -8,7 +8,7 @@ import ctypes
 import pygame
 from pygame._sdl2.video import Window
 
-from src.globals import Globals, Config
+from src.globals import Config, get_screen_size
 
 
 class TitleBar:
@@ -44,6 +44,7 @@ class TitleBar:
             if e.type == pygame.MOUSEBUTTONUP:
                 self._title_selected = False
         mx, my = self.get_mouse_position()
+        screen_width, screen_height = get_screen_size()
         if self._title_selected:
             x = mx - self._title_x
             y = my - self._title_y
@@ -51,8 +52,8 @@ class TitleBar:
                 x = 0
                 if selected:
                     self._title_x = pos[0]
-            elif x > Globals.SCREEN_WIDTH - Config.W:
-                x = Globals.SCREEN_WIDTH - Config.W
+            elif x > screen_width - Config.W:
+                x = screen_width - Config.W
                 if selected:
                     self._title_x = pos[0]
 
@@ -60,8 +61,8 @@ class TitleBar:
                 y = 0
                 if selected:
                     self._title_y = pos[1]
-            elif y > Globals.SCREEN_HEIGHT - rect.h:
-                y = Globals.SCREEN_HEIGHT - rect.h
+            elif y > screen_height - rect.h:
+                y = screen_height - rect.h
                 if selected:
                     self._title_y = pos[1]
 
@@ -1,11 +1,26 @@
-import math
-from functools import lru_cache
+import asyncio
 
+import numpy as np
 import pygame
 from pygame.math import clamp
 
+from src.backend import get_window_size
 from src.globals import BaseStructure, Config, Events, get_text
-from src.utils import Timer, Point
+from src.utils import SurfaceCache, Timer, Point
+
+# running button actions, the event loop only keeps weak references to its tasks
+_actions = set()
+
+
+def _action_done(task):
+    _actions.discard(task)
+    # reported like any unhandled error, instead of being lost with the task
+    if not task.cancelled() and task.exception() is not None:
+        task.get_loop().call_exception_handler({
+            'message': 'Unhandled exception in a button action',
+            'exception': task.exception(),
+            'task': task
+        })
 
 
 class UI(BaseStructure):
@@ -36,11 +51,18 @@ class UI(BaseStructure):
     def pos(self, value):
         self.x, self.y = value
 
+    def get_dirty_rect(self):
+        return self.rect
+
 
 class Button(UI):
     def __init__(self, name, action=None, repeat=False, **kwargs):
         # self.text = self.text.subsurface(self.text.get_bounding_rect())
         self.name = name
+        # label surfaces, reused until the name changes
+        self._label_name = None
+        self._label = None
+        self._selected_label = None
         super().__init__(self.text.get_rect().scale_by(1.4, 1))
         for i in kwargs:
             try:
@@ -51,7 +73,7 @@ class Button(UI):
         self.action = action
         self.hovered = False
         self._re_adjust = False
-        self._old_screen_dimensions = pygame.display.get_window_size()
+        self._old_screen_dimensions = get_window_size()
         self._cap_x = 0, Config.W
         self._cap_y = 0, Config.H
         self.selected = False
@@ -61,12 +83,37 @@ class Button(UI):
 
     @property
     def text(self):
-        return get_text(self.name, 'black')
+        if self._label_name != self.name:
+            self._label = get_text(self.name, 'black')
+            self._selected_label = None
+            self._label_name = self.name
+        return self._label
+
+    @property
+    def selected_text(self):
+        text = self.text
+        if self._selected_label is None:
+            self._selected_label = pygame.transform.smoothscale_by(text, 0.9)
+        return self._selected_label
 
     def readjust(self):
         self._re_adjust = True
         return self
 
+    def needs_redraw(self):
+        # held down repeat buttons keep firing their action
+        return self.selected and self.repeat
+
+    def get_draw_state(self):
+        return self.name, self.hovered, self.selected
+
+    def run_action(self):
+        # actions that are coroutines (the editor's dialogs) run on the event loop next to it
+        if self.action and asyncio.iscoroutine(result := self.action()):
+            task = asyncio.ensure_future(result)
+            _actions.add(task)
+            task.add_done_callback(_action_done)
+
     def cap_x(self, start, end):
         self._cap_x = start, end
 
@@ -82,7 +129,7 @@ class Button(UI):
             self.rect.y = pygame.math.clamp(self.rect.y, *self._cap_y)
 
     def update(self, events: list[pygame.event.Event], dt):
-        if self._re_adjust and self._old_screen_dimensions != (c := pygame.display.get_window_size()):
+        if self._re_adjust and self._old_screen_dimensions != (c := get_window_size()):
             w1, h1 = c
             w2, h2 = self._old_screen_dimensions
             dw, dh = w2 - w1, h2 - h1
@@ -95,13 +142,11 @@ class Button(UI):
                     if self.rect.collidepoint(mx, my):
                         if self.repeat:
                             self.click_delay_timer.reset()
-                            if self.action:
-                                self.action()
+                            self.run_action()
                         self.selected = True
             if e.type == pygame.MOUSEBUTTONUP:
                 if self.rect.collidepoint(mx, my) and not self.repeat:
-                    if self.action:
-                        self.action()
+                    self.run_action()
                 self.selected = False
                 self.click_repeat = False
                 self.click_delay_timer.reset()
@@ -117,14 +162,13 @@ class Button(UI):
                 self.click_repeat = True
             if self.click_repeat:
                 if self.click_timer.tick:
-                    if self.action:
-                        self.action()
+                    self.run_action()
 
     def draw(self, screen: pygame.Surface):
         color = 'orange' if self.hovered else 'white'
         pygame.draw.rect(screen, color, self.rect, border_radius=5)
         if self.selected:
-            t = pygame.transform.smoothscale_by(self.text, 0.9)
+            t = self.selected_text
             # pygame.draw.rect(screen, 'brown', self.rect, 5, border_radius=5)
         else:
             t = self.text
@@ -138,6 +182,9 @@ class SpinBoxNumeric(UI):
         self.high = high
         self.action = action
         self.value = 0 if not initial else initial
+        # label surface, reused until the displayed text changes
+        self._label_text = None
+        self._label = None
         t = get_text('@' * self.max_digits, 'white')
         self.decrease = decrease = Button('<', self.decrease_value, True)
         self.increase = increase = Button('>', self.increase_value, True)
@@ -146,7 +193,10 @@ class SpinBoxNumeric(UI):
 
     @property
     def text(self):
-        return get_text(self.get_text(), 'white')
+        if self._label_text != (text := self.get_text()):
+            self._label = get_text(text, 'white')
+            self._label_text = text
+        return self._label
 
     def increase_value(self):
         if self.high != '...' and self.value >= self.high:
@@ -170,6 +220,13 @@ class SpinBoxNumeric(UI):
     # def update_text(self):
     #     self.text = pygame.font.SysFont(Config.FONT_NAME, Config.FONT_SIZE).render(self.get_text(), True, 'white')
 
+    def needs_redraw(self):
+        return self.increase.needs_redraw() or self.decrease.needs_redraw()
+
+    def get_draw_state(self):
+        return (self.get_text(), self.increase.get_draw_state(), self.decrease.get_draw_state(),
+                tuple(self.increase.rect), tuple(self.decrease.rect))
+
     def update(self, events: list[pygame.event.Event], dt):
         self.decrease.rect.topleft = [self.rect.x + self.text.get_width(), self.rect.y]
         self.increase.rect.topleft = self.decrease.rect.topright
@@ -194,6 +251,13 @@ class TextBox(UI):
         self.value = ''
         self.selected = False
 
+    def needs_redraw(self):
+        # blinking cursor
+        return self.selected
+
+    def get_draw_state(self):
+        return self.value, self.selected, self.cursor_visible
+
     def update(self, events: list[pygame.event.Event], dt):
         mx, my = pygame.mouse.get_pos()
         for e in events:
@@ -213,13 +277,13 @@ class TextBox(UI):
                     if e.key == pygame.K_BACKSPACE:
                         if self.value:
                             self.value = self.value[:-1]
+        if self.selected and self.blink_timer.tick:
+            self.cursor_visible = not self.cursor_visible
 
     def draw(self, screen: pygame.Surface):
         text = self.value if self.value else self.initial
         if self.selected:
             text = self.value
-            if self.blink_timer.tick:
-                self.cursor_visible = not self.cursor_visible
             if self.cursor_visible:
                 text += '_'
             else:
@@ -278,6 +342,13 @@ class Slider(UI):
         selectable_rect.center = [self.rect.x + self.coord[0], self.rect.y + self.coord[1]]
         return selectable_rect
 
+    def get_dirty_rect(self):
+        # the knob sticks out of the slider
+        return self.rect.union(self.selectable_rect.inflate(4, 4))
+
+    def get_draw_state(self):
+        return tuple(self.coord), self.img
+
     def update_value(self):
         self.value = self.get_value(*self.coord)
 
@@ -317,6 +388,10 @@ class Slider(UI):
 
 
 class ColorPicker(UI):
+    # gradients are shared by all color pickers, see get_gradient
+    gradient_cache = SurfaceCache(Config.GRADIENT_CACHE_BYTES)
+    HUE_STEP = 2  # degrees
+
     def __init__(self, width, height, initial_values=None):
         assert height >= 50, width >= 200
         self.slider_height = 5
@@ -339,7 +414,7 @@ class ColorPicker(UI):
         self.slider_action(force=True)
         self.gradient_slider_action()
 
-        # function call for caching (requires approx 25 - 20 MB RAM)
+        # function call for caching (requires approx 25 - 20 MB RAM, more than Config.GRADIENT_CACHE_BYTES)
         # self.slider_img.lock()
         # img = self.slider_img
         # _, h = self.slider_img.get_size()
@@ -373,6 +448,13 @@ class ColorPicker(UI):
         color = self.gradient_slider.value
         self.output_box.fill(color)
 
+    def get_dirty_rect(self):
+        return self.rect.unionall([self.gradient_slider.get_dirty_rect(), self.slider.get_dirty_rect()])
+
+    def get_draw_state(self):
+        return (self.slider.get_draw_state(), self.gradient_slider.get_draw_state(), tuple(self.value),
+                tuple(self.slider.rect), tuple(self.gradient_slider.rect))
+
     def update(self, events: list[pygame.event.Event], dt):
         for i in (self.slider, self.gradient_slider,):
             i.update(events, dt)
@@ -388,9 +470,26 @@ class ColorPicker(UI):
         self.slider.draw(screen)
         # screen.blit(self.gradient, rect)
 
+    @classmethod
+    def get_gradient(cls, w, h, _color='red'):
+        """
+        Cached gradient for the hue of `_color`, quantized to HUE_STEP so that
+        neighbouring slider positions share one surface
+        """
+        color = pygame.Color(_color)
+        hue, saturation, value, _ = color.hsva
+        hue = round(hue / cls.HUE_STEP) * cls.HUE_STEP % 360
+        saturation, value = round(saturation), round(value)
+        key = int(w), int(h), hue, saturation, value
+        surf = cls.gradient_cache.get(key)
+        if surf is None:
+            color.hsva = hue, saturation, value, 100
+            surf = cls.render_gradient(w, h, color)
+            cls.gradient_cache.put(key, surf)
+        return surf
+
     @staticmethod
-    @lru_cache(maxsize=400)
-    def get_gradient(w, h, _color='red'):
+    def render_gradient(w, h, _color='red'):
         _color = [*pygame.Color(_color)]
 
         # def fragment(x, y, base_color):
@@ -421,40 +520,28 @@ class ColorPicker(UI):
         #
         #     return final_color
 
-        sqrt = math.sqrt
-
         def fragment(x, y, base_color):
+            # x and y are broadcast against each other, computing every pixel at once
             r1, g1, b1, a1 = base_color
-            r = g = b = 255 * (1 - sqrt(y))
+            r = g = b = 255 * (1 - np.sqrt(y))
             a = x * (1 - y)
             one_minus_a = 1 - a
             final_color = (
                 r * one_minus_a + r1 * a,
                 g * one_minus_a + g1 * a,
-                b * one_minus_a + b1 * a,
-                255
+                b * one_minus_a + b1 * a
             )
 
-            return final_color
+            return np.stack(final_color, axis=-1)
 
         def shader(width, height, base_color):
             width = int(width)
             height = int(height)
             surf = pygame.Surface([width, height])
-            # surf.fill(base_color)
-
-            surf.lock()
-            # t = time.time()
-            # fragment = lambda x, y, z: (255, 0, 0, 255)
-            for x in range(width):
-                for y in range(height):
-                    color = fragment(x / width, y / height, base_color)
-                    surf.set_at([x, y], [*color])
-            # one liner for performance
-            # [surf.set_at([x, y], [*fragment(x / width, y / height, surf.get_at([x, y]))])
-            # for x in range(width) for y in range(height)]
-            # print(time.time() - t)
-            surf.unlock()
+            x = np.arange(width)[:, None] / width
+            y = np.arange(height)[None, :] / height
+            # truncated like set_at does with float colors
+            pygame.surfarray.blit_array(surf, fragment(x, y, base_color).astype(np.uint8))
 
             return surf
 
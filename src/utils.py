@@ -1,4 +1,7 @@
+import json
 import time
+from collections import OrderedDict
+from pathlib import Path
 from typing import Literal, Union
 
 import pygame
@@ -102,6 +105,97 @@ class SpriteSheet:
         return [pygame.transform.scale_by(i, self.scale) for i in images]
 
 
+class TextureAtlas:
+    """
+    Class to load rock atlases (see src/atlas.py), one texture per atlas page
+    """
+
+    def __init__(self, renderer, manifest, scale=1.0):
+        manifest = Path(manifest)
+        with open(manifest) as f:
+            self.manifest = json.load(f)
+        self._pages = [pygame.image.load(manifest.with_name(i)) for i in self.manifest['pages']]
+        self.textures = [Texture.from_surface(renderer, i) for i in self._pages]
+        self.rocks = self.manifest['rocks']
+        self.rects = [pygame.Rect(i['rect']) for i in self.rocks]
+        self.scale = scale
+
+    def __str__(self):
+        return f'TextureAtlas Object <{len(self.rocks)} rocks, {len(self.textures)} pages>'
+
+    def __len__(self):
+        return len(self.rocks)
+
+    def get_image(self, index):
+        return self._pages[self.rocks[index]['page']].subsurface(self.rects[index])
+
+    def draw(self, index, x, y, angle=0, flip_x=False, flip_y=False):
+        """
+        Draws a rock with its center at x, y, rotated around its center
+        """
+        rock = self.rocks[index]
+        rect = self.rects[index]
+        k = self.scale
+        dx, dy = rock['offset']
+        self.textures[rock['page']].draw(rect, pygame.Rect(x + dx * k, y + dy * k, rect.w * k, rect.h * k), angle,
+                                         (-dx * k, -dy * k), flip_x=flip_x, flip_y=flip_y)
+
+
+class SurfaceCache:
+    """
+    LRU cache of surfaces, bounded by the total size of their pixel data
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._surfaces = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    @staticmethod
+    def get_size(surface: pygame.Surface):
+        return surface.get_pitch() * surface.get_height()
+
+    def get(self, key):
+        surface = self._surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+        else:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+        return surface
+
+    def put(self, key, surface: pygame.Surface):
+        if key in self._surfaces:
+            self.bytes -= self.get_size(self._surfaces.pop(key))
+        size = self.get_size(surface)
+        if size > self.max_bytes:
+            return
+        self._surfaces[key] = surface
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._surfaces.popitem(last=False)
+            self.bytes -= self.get_size(evicted)
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+    @property
+    def stats(self):
+        return {
+            'entries': len(self),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
 class Timer:
     def __init__(self, timeout=0.0, reset=True, callback=None):
         self.timeout = timeout